@@ -0,0 +1,459 @@
+"""自炊本管理ソフトのベンチマーク。
+
+合成した書籍ライブラリ (N冊 × Mページ、JPEG/PNG/WebP、無圧縮/Deflate圧縮の混在) を作成し、
+BookManagerAppの主要な処理の所要時間を計測してJSONで出力します。
+
+    python benchmark.py --books 200 --pages 40 --output bench.json
+    python benchmark.py --baseline bench.json --tolerance 0.25 --budget page_load_cold=80
+
+ディスプレイとttkbootstrapが使える環境では実際のTkで、使えない環境 (CIなど) では
+Tkのウィジェットを何もしない代替オブジェクトに差し替えて (--tk stub) 実行します。
+基準結果 (--baseline) より中央値が許容範囲を超えて遅くなった項目、または
+上限 (--budget) を超えた項目があれば、終了コード1で終了します。
+"""
+import argparse
+import io
+import itertools
+import json
+import os
+import platform
+import queue
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+
+from PIL import Image, ImageDraw
+import PIL
+
+import book_manager
+
+# ====================================================
+# 合成ライブラリの作成
+# ====================================================
+
+IMAGE_FORMATS = {'jpeg': ('JPEG', '.jpg'), 'png': ('PNG', '.png'), 'webp': ('WEBP', '.webp')}
+
+
+def make_page_image(page_size, seed):
+    """スキャンした漫画のページに近い (ノイズと線画を含む) 画像を作成します。"""
+    width, height = page_size
+    # 紙の質感程度のノイズ (縮小して作ったものを拡大し、実際のスキャン画像に近い圧縮率にする)
+    img = Image.effect_noise((max(1, width // 4), max(1, height // 4)), 24).resize((width, height)).convert('RGB')
+    draw = ImageDraw.Draw(img)
+    step = max(8, width // 12)
+    for i in range(0, width + height, step):
+        offset = (i + seed * 7) % (width + height)
+        draw.line([(offset, 0), (0, offset)], fill=(20, 20, 20), width=3)
+    draw.rectangle([width // 10, height // 10, width * 9 // 10, height * 9 // 10], outline=(0, 0, 0), width=6)
+    return img
+
+
+def encode_page(img, format_name):
+    """画像を指定形式でエンコードしたバイト列を返します。"""
+    buffer = io.BytesIO()
+    pil_format, _ = IMAGE_FORMATS[format_name]
+    options = {'quality': 85} if pil_format in ('JPEG', 'WEBP') else {}
+    img.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def generate_library(folder, books, pages, formats, page_size):
+    """合成したCBZ書籍をフォルダに作成し、合計サイズ (バイト) を返します。
+
+    偶数番目の書籍は無圧縮 (ZIP_STORED)、奇数番目はDeflate圧縮で格納し、
+    ページの形式はformatsを順に割り当てます。ページ名は自然順ソートが必要な
+    ゼロ埋めなしの連番 (page1, page2, ..., page10) です。
+    """
+    os.makedirs(folder, exist_ok=True)
+    # エンコードは時間がかかるため、形式ごとに数種類のページを作って使い回す
+    variants = 4
+    encoded = {
+        format_name: [encode_page(make_page_image(page_size, seed), format_name) for seed in range(variants)]
+        for format_name in formats
+    }
+    total_bytes = 0
+    for book in range(books):
+        compression = zipfile.ZIP_STORED if book % 2 == 0 else zipfile.ZIP_DEFLATED
+        book_path = os.path.join(folder, f"synthetic book {book + 1}.cbz")
+        with zipfile.ZipFile(book_path, 'w', compression=compression) as archive:
+            for page in range(pages):
+                format_name = formats[(book + page) % len(formats)]
+                _, extension = IMAGE_FORMATS[format_name]
+                archive.writestr(f"page{page + 1}{extension}", encoded[format_name][page % variants])
+        total_bytes += os.path.getsize(book_path)
+    return total_bytes
+
+
+# ====================================================
+# Tkの代替 (ディスプレイのない環境用)
+# ====================================================
+
+class HeadlessWidget:
+    """Tkのウィジェットの代わりに使う、何もしないオブジェクト。
+
+    キャンバスのサイズ (winfo_width/winfo_height) だけは指定された値を返します。
+    """
+    canvas_size = (1200, 800)
+
+    def __init__(self, *args, **kwargs):
+        self._item_ids = itertools.count(1)
+
+    def __getattr__(self, name):
+        return self._ignore
+
+    def _ignore(self, *args, **kwargs):
+        return ()
+
+    def __getitem__(self, key):
+        return ()
+
+    def __setitem__(self, key, value):
+        pass
+
+    def winfo_width(self):
+        return self.canvas_size[0]
+
+    def winfo_height(self):
+        return self.canvas_size[1]
+
+    def insert(self, *args, **kwargs):
+        # Treeviewの行IDとして使われるため、呼び出しごとに異なる値を返す
+        return f"I{next(self._item_ids)}"
+
+
+class HeadlessVariable:
+    """tk.StringVar/BooleanVarの代わりに値だけを保持するオブジェクト。"""
+
+    def __init__(self, master=None, value=None, name=None):
+        self.value = value
+
+    def get(self):
+        return '' if self.value is None else self.value
+
+    def set(self, value):
+        self.value = value
+
+    def trace_add(self, mode, callback):
+        return ''
+
+
+class HeadlessModule:
+    """tk/ttkモジュールの代わり。属性は全て代替ウィジェット (変数クラスは代替変数) になります。"""
+
+    def __getattr__(self, name):
+        return HeadlessVariable if name.endswith('Var') else HeadlessWidget
+
+
+class HeadlessPhotoImage:
+    """ImageTk.PhotoImageの代わり。Tkへの転送の代わりに画素データのコピーだけを行います。"""
+
+    def __init__(self, image):
+        self.size = image.size
+        self.data = image.convert('RGB').tobytes()
+
+    def width(self):
+        return self.size[0]
+
+    def height(self):
+        return self.size[1]
+
+
+class HeadlessImageTk:
+    PhotoImage = HeadlessPhotoImage
+
+
+def use_headless_tk(canvas_size):
+    """book_managerモジュールが使うTkを代替オブジェクトに差し替え、rootの代わりを返します。"""
+    HeadlessWidget.canvas_size = canvas_size
+    book_manager.tk = HeadlessModule()
+    book_manager.ttk = HeadlessModule()
+    book_manager.ImageTk = HeadlessImageTk
+    return HeadlessWidget()
+
+
+def create_root(tk_mode, canvas_size):
+    """計測に使うrootウィンドウを作成し、(root, 実際に使うモード) を返します。"""
+    if tk_mode in ('auto', 'real'):
+        try:
+            import ttkbootstrap as ttkb
+            root = ttkb.Window(themename="superhero")
+            # プレビューキャンバスが指定のサイズに近くなるよう、左パネルの分だけ広げる
+            root.geometry(f"{canvas_size[0] + 400}x{canvas_size[1] + 120}")
+            root.update()
+            return root, 'real'
+        except Exception as e:
+            if tk_mode == 'real':
+                raise
+            print(f"Tkを使用できないため、代替オブジェクトで計測します: {e}", file=sys.stderr)
+    return use_headless_tk(canvas_size), 'stub'
+
+
+# ====================================================
+# 計測
+# ====================================================
+
+def summarize(samples):
+    """計測値 (秒) のリストをミリ秒単位の統計にまとめます。"""
+    values = sorted(sample * 1000 for sample in samples)
+    p95_index = min(len(values) - 1, int(round(0.95 * (len(values) - 1))))
+    return {
+        'unit': 'ms',
+        'count': len(values),
+        'min': round(values[0], 3),
+        'median': round(statistics.median(values), 3),
+        'p95': round(values[p95_index], 3),
+        'max': round(values[-1], 3),
+    }
+
+
+def drain_ui_queue(app):
+    """バックグラウンド処理からUIに登録された処理を全て実行します。"""
+    while True:
+        try:
+            func, args = app.ui_queue.get_nowait()
+        except queue.Empty:
+            break
+        func(*args)
+    app.master.update()
+
+
+def wait_for_scan(app):
+    """フォルダスキャン (ページ数の計算を含む) が終わるまで待ち、結果をUIに反映します。"""
+    for thread in threading.enumerate():
+        if thread.name == 'library-scan':
+            thread.join()
+    drain_ui_queue(app)
+
+
+def wait_for_zoom_source(app):
+    """拡大表示用の画像のデコードが終わるまで待ち、タイルの差し替えを行います。"""
+    for thread in threading.enumerate():
+        if thread.name == 'zoom-decode':
+            thread.join()
+    drain_ui_queue(app)
+
+
+def run_benchmark(app, library_folder, options):
+    """各処理の所要時間を計測し、{項目名: 計測値 (秒) のリスト} を返します。"""
+    samples = {}
+
+    def measure(name, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        samples.setdefault(name, []).append(time.perf_counter() - start)
+        return result
+
+    def timed_scan():
+        app.load_files()
+        wait_for_scan(app)
+
+    app.current_folder = library_folder
+    # 初回 (インデックスなし、全冊のページ数を計算) と、インデックス作成後の再読み込み
+    measure('scan_cold', timed_scan)
+    for _ in range(options.repeat):
+        measure('scan_warm', timed_scan)
+
+    books = app.files[:options.open_books]
+    for file_path in books:
+        app.archive_pool.close_all()
+        app.page_cache.clear()
+        measure('book_open', app.display_preview, file_path, 0)
+
+        page_indices = range(1, min(len(app.current_book_images), options.page_loads + 1))
+        for index in page_indices:
+            measure('page_load_cold', app.load_page_image, index, False)
+            measure('page_load_warm', app.load_page_image, index, False)
+
+        for _ in range(options.repeat):
+            # キャッシュを使わず (page_key=None)、毎回縮小処理を行う
+            measure('resize', app.get_resized_photoimage, app.original_image)
+
+        # 見開き表示 (2ページの並列デコードと連結、連結済み画像のキャッシュ)
+        app.settings['spread_mode'] = True
+        app.page_cache.clear()
+        index = 1
+        for _ in page_indices:
+            if index >= len(app.current_book_images):
+                break
+            shown = measure('spread_load_cold', app.load_page_image, index, False, 'next')
+            measure('spread_load_warm', app.load_page_image, index, False, 'next')
+            index = shown[-1] + 1
+        app.settings['spread_mode'] = False
+
+        # 拡大表示 (表示中の画像を拡大したタイル、倍率に合わせたデコード後の差し替え、表示範囲の移動)
+        measure('zoom_in', app.zoom_by, 2.0)
+        measure('zoom_source', wait_for_zoom_source, app)
+        for _ in range(options.repeat):
+            measure('zoom_pan', app.pan_zoom, -64, -64)
+        app.reset_zoom()
+
+    # 読書進捗: メモリ上の更新と、全冊分の進捗のファイル/インデックスへの書き出し
+    for index, file_path in enumerate(app.files):
+        app.current_file_path = file_path
+        measure('progress_update', app.update_progress, index % options.pages + 1)
+    for _ in range(options.repeat):
+        for file_path in app.files:
+            app.reading_progress[file_path] = app.reading_progress.get(file_path, 0) + 1
+        measure('progress_flush', app.reading_progress.flush)
+
+    return samples
+
+
+# ====================================================
+# 回帰判定
+# ====================================================
+
+def parse_budgets(values):
+    """'項目名=ミリ秒' 形式の指定を辞書にします。"""
+    budgets = {}
+    for value in values:
+        name, _, limit = value.partition('=')
+        if not limit:
+            raise argparse.ArgumentTypeError(f"--budgetは 項目名=ミリ秒 の形式で指定してください: {value}")
+        budgets[name] = float(limit)
+    return budgets
+
+
+def find_regressions(metrics, baseline, tolerance, min_delta_ms, budgets):
+    """基準結果からの悪化と上限超過を調べ、問題のあった項目のリストを返します。"""
+    regressions = []
+    for name, stats in metrics.items():
+        base = baseline.get(name) if baseline else None
+        if base:
+            allowed = base['median'] * (1 + tolerance)
+            if stats['median'] > allowed and stats['median'] - base['median'] > min_delta_ms:
+                regressions.append({
+                    'metric': name, 'reason': 'baseline',
+                    'median': stats['median'], 'baseline': base['median'], 'allowed': round(allowed, 3),
+                })
+        limit = budgets.get(name)
+        if limit is not None and stats['median'] > limit:
+            regressions.append({'metric': name, 'reason': 'budget', 'median': stats['median'], 'allowed': limit})
+    unknown = set(budgets) - set(metrics)
+    for name in sorted(unknown):
+        regressions.append({'metric': name, 'reason': 'unknown metric'})
+    return regressions
+
+
+def load_baseline(path, tk_mode):
+    """基準結果のJSONから計測値を読み込みます。(計測モードが異なる場合は比較しない)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get('environment', {}).get('tk_mode') != tk_mode:
+        print("基準結果とTkのモードが異なるため、基準との比較は行いません。", file=sys.stderr)
+        return None
+    return data.get('metrics', {})
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="自炊本管理ソフトのベンチマーク")
+    parser.add_argument('--books', type=int, default=100, help="合成する書籍の数")
+    parser.add_argument('--pages', type=int, default=30, help="1冊あたりのページ数")
+    parser.add_argument('--formats', default='jpeg,png,webp', help="ページの画像形式 (カンマ区切り)")
+    parser.add_argument('--page-size', default='1600x2400', help="ページの画像サイズ (幅x高さ)")
+    parser.add_argument('--canvas-size', default='1200x800', help="プレビューキャンバスのサイズ (幅x高さ)")
+    parser.add_argument('--open-books', type=int, default=5, help="開いて計測する書籍の数")
+    parser.add_argument('--page-loads', type=int, default=10, help="1冊あたりに読み込むページ数")
+    parser.add_argument('--repeat', type=int, default=5, help="繰り返し計測する回数")
+    parser.add_argument('--stages', action='store_true', help="段階ごとの処理時間 (LatencyStats) も出力する")
+    parser.add_argument('--tk', choices=('auto', 'real', 'stub'), default='auto', help="Tkの使い方")
+    parser.add_argument('--library', help="合成ライブラリを作成するフォルダ (既にあれば再利用)")
+    parser.add_argument('--output', help="結果のJSONを書き出すファイル (省略時は標準出力)")
+    parser.add_argument('--baseline', help="比較する基準結果のJSON")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="基準結果の中央値から許容する悪化の割合")
+    parser.add_argument('--min-delta-ms', type=float, default=1.0, help="これ未満の悪化は誤差として無視する (ミリ秒)")
+    parser.add_argument('--budget', action='append', default=[], metavar='NAME=MS', help="項目ごとの中央値の上限")
+    options = parser.parse_args(argv)
+
+    options.formats = [name.strip().lower() for name in options.formats.split(',') if name.strip()]
+    unknown = [name for name in options.formats if name not in IMAGE_FORMATS]
+    if unknown:
+        parser.error(f"未対応の画像形式です: {', '.join(unknown)}")
+    try:
+        options.page_size = tuple(int(v) for v in options.page_size.lower().split('x'))
+        options.canvas_size = tuple(int(v) for v in options.canvas_size.lower().split('x'))
+        options.budget = parse_budgets(options.budget)
+    except (ValueError, argparse.ArgumentTypeError) as e:
+        parser.error(str(e))
+    return options
+
+
+def main(argv=None):
+    options = parse_args(argv)
+    work_dir = tempfile.mkdtemp(prefix="book_manager_bench_")
+    library_folder = os.path.abspath(options.library or os.path.join(work_dir, "library"))
+
+    original_dir = os.getcwd()
+    app = None
+    try:
+        start = time.perf_counter()
+        if not os.path.isdir(library_folder) or not os.listdir(library_folder):
+            total_bytes = generate_library(library_folder, options.books, options.pages, options.formats, options.page_size)
+        else:
+            total_bytes = sum(entry.stat().st_size for entry in os.scandir(library_folder) if entry.is_file())
+        generate_seconds = time.perf_counter() - start
+
+        # 設定/進捗/インデックス/サムネイルは作業フォルダに作り、普段使いのデータには触れない
+        os.chdir(work_dir)
+        root, tk_mode = create_root(options.tk, options.canvas_size)
+        app = book_manager.BookManagerApp(root)
+        app.settings.update({
+            'watch_interval_sec': 0,   # 監視スレッドが計測に影響しないようにする
+            'prefetch_pages': 0,       # 未読み込みページ (cold) の計測が先読みで温まらないようにする
+            'is_animation_enabled': False,
+            'view_mode': 'list',
+        })
+        app.latency.enabled = options.stages
+        samples = run_benchmark(app, library_folder, options)
+        stages = app.latency.summary() if options.stages else None
+        book_count = len(app.files)
+    finally:
+        if app is not None:
+            app.on_closing()
+        os.chdir(original_dir)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    metrics = {name: summarize(values) for name, values in samples.items()}
+    baseline = load_baseline(options.baseline, tk_mode) if options.baseline else None
+    regressions = find_regressions(metrics, baseline, options.tolerance, options.min_delta_ms, options.budget)
+    result = {
+        'environment': {
+            'tk_mode': tk_mode,
+            'python': platform.python_version(),
+            'pillow': PIL.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'library': {
+            'path': library_folder if options.library else None,
+            'books': book_count,
+            'pages_per_book': options.pages,
+            'formats': options.formats,
+            'page_size': list(options.page_size),
+            'total_mb': round(total_bytes / (1024 * 1024), 1),
+            'generate_sec': round(generate_seconds, 2),
+        },
+        'canvas_size': list(options.canvas_size),
+        'metrics': metrics,
+        'stages': stages,
+        'regressions': regressions,
+        'passed': not regressions,
+    }
+
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if options.output:
+        with open(options.output, 'w', encoding='utf-8') as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    for regression in regressions:
+        print(f"性能の悪化: {regression}", file=sys.stderr)
+    return 0 if not regressions else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
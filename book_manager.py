@@ -1,39 +1,1838 @@
+import time
+STARTUP_BEGIN = time.perf_counter() # 起動時間の計測の基準 (このモジュールの読み込み開始時点)
+
 import tkinter as tk
-from tkinter import filedialog, ttk
+from tkinter import ttk
 import os
+import sys
 import zipfile
 import io
+import mmap
+import struct
+import zlib
 import json
+import csv
 import stat
-from PIL import Image, ImageTk
+import threading
+import queue
+import sqlite3
+import hashlib
+import datetime
+import re
+import unicodedata
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+# Note: このコードを実行するには、以下のライブラリが必要です。
+# pip install ttkbootstrap Pillow
+
+# Pillowは起動を速くするため、最初に画像を扱うとき (import_pillow) に読み込みます。
+Image = None
+ImageTk = None
+
+
+def import_pillow():
+    """Pillow (ImageとImageTk) をまだ読み込んでいなければ読み込みます。"""
+    global Image, ImageTk
+    if Image is None:
+        from PIL import Image as pil_image
+        Image = pil_image
+    if ImageTk is None:
+        from PIL import ImageTk as pil_imagetk
+        ImageTk = pil_imagetk
+
+
+# 対応する画像拡張子 (webpを含む) と書籍ファイル拡張子
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+BOOK_EXTENSIONS = ('.zip', '.cbz')
+
+# 設定/読書進捗/ライブラリインデックス/サムネイルの保存先 (GUIとコマンドラインで共通)
+SETTINGS_FILE = "settings.json"
+PROGRESS_FILE = "progress.json"
+LIBRARY_DB_FILE = "library.db"
+THUMBNAIL_DIR = "thumbnails"
+
+# ====================================================
+# 自然順ソート
+# ====================================================
+
+DIGIT_RUN_PATTERN = re.compile(r'(\d+)')
+
+
+def natural_sort_key(name):
+    """数字の並びを数値として比較する自然順ソート用のキーを返します。
+
+    page2.jpg < page10.jpg の順になります。NFKC正規化により全角数字/全角英字も
+    半角と同じものとして比較し、大文字小文字は区別しません。
+    """
+    normalized = unicodedata.normalize('NFKC', name).casefold()
+    # 分割結果は [文字列, 数値, 文字列, 数値, ...] の順に並ぶため、同じ位置同士は常に比較可能
+    parts = DIGIT_RUN_PATTERN.split(normalized)
+    parts[1::2] = [int(digits) for digits in parts[1::2]]
+    # 数値が等しい場合 (01 と 1 など) も順序が決まるよう、元の名前を最後に比較する
+    return tuple(parts), name
+
+
+# ====================================================
+# 書籍名の検索
+# ====================================================
+
+# カタカナ (ァ〜ヶ) をひらがなに変換する表
+KATAKANA_TO_HIRAGANA = {code: code - 0x60 for code in range(0x30A1, 0x30F7)}
+
+
+def normalize_search_text(text):
+    """検索用に文字列を正規化します。
+
+    NFKC正規化で全角/半角 (英数字、半角カタカナ) を統一し、大文字小文字と
+    カタカナ/ひらがなを区別しないようにします。
+    """
+    return unicodedata.normalize('NFKC', text).casefold().translate(KATAKANA_TO_HIRAGANA)
+
+
+def parse_search_query(query):
+    """検索語を正規化し、(検索文字列, 先頭一致のみか) を返します。
+
+    検索語の先頭に '^' を付けると、書籍名の先頭が一致するものだけを対象にします。
+    """
+    query = normalize_search_text(query.strip())
+    if query.startswith('^'):
+        return query[1:], True
+    return query, False
+
+
+def matches_search_text(text, query, prefix_only=False):
+    """正規化済みの書籍名が検索文字列に一致するか返します。"""
+    return text.startswith(query) if prefix_only else query in text
+
+
+class SearchIndex:
+    """書籍名の3文字のn-gram (3-gram) から書籍を引く転置インデックス。
+
+    3文字以上の検索語は、最も該当数の少ない3-gramの候補だけを部分一致で確かめます。
+    1〜2文字の検索語は候補を絞り込めないため、正規化済みの書籍名を順に照合します。
+    (1〜2文字のn-gramも登録すると、5万冊でメモリ使用量が数倍になるため)
+    3-gramの多くは1冊にしか現れないため、その場合は集合を作らずファイルパスをそのまま保持します。
+    漢字やかなは単語の区切りがないため、形態素解析ではなく文字n-gramを使います。
+    """
+    GRAM = 3
+
+    def __init__(self):
+        self.texts = {}    # 正規化済みの書籍名 {ファイルパス: 文字列}
+        self.postings = {} # {3-gram: そのn-gramを含むファイルパス (1冊のみ) またはその集合}
+
+    def __len__(self):
+        return len(self.texts)
+
+    def add(self, file_path, title):
+        """書籍を登録します。(登録済みなら書籍名を更新)"""
+        self.remove(file_path)
+        text = normalize_search_text(title)
+        self.texts[file_path] = text
+        for gram in self.iter_grams(text):
+            paths = self.postings.get(gram)
+            if paths is None:
+                self.postings[gram] = file_path
+            elif isinstance(paths, set):
+                paths.add(file_path)
+            elif paths != file_path:
+                self.postings[gram] = {paths, file_path}
+
+    def remove(self, file_path):
+        """書籍の登録を解除します。"""
+        text = self.texts.pop(file_path, None)
+        if text is None:
+            return
+        for gram in self.iter_grams(text):
+            paths = self.postings.get(gram)
+            if paths == file_path:
+                del self.postings[gram]
+            elif isinstance(paths, set):
+                paths.discard(file_path)
+                if len(paths) == 1:
+                    self.postings[gram] = paths.pop()
+
+    def iter_grams(self, text):
+        """文字列に含まれる3-gramを重複なく返します。"""
+        return {text[start:start + self.GRAM] for start in range(len(text) - self.GRAM + 1)}
+
+    def get_paths(self, gram):
+        """3-gramを含むファイルパスの集合 (またはタプル) を返します。"""
+        paths = self.postings.get(gram, ())
+        return (paths,) if isinstance(paths, str) else paths
+
+    def search(self, query):
+        """検索語を含む書籍のファイルパスの集合を返します。(検索語の書式はparse_search_queryを参照)"""
+        query, prefix_only = parse_search_query(query)
+        if not query:
+            return set(self.texts)
+
+        if len(query) < self.GRAM:
+            return {path for path, text in self.texts.items() if matches_search_text(text, query, prefix_only)}
+
+        candidates = min((self.get_paths(gram) for gram in self.iter_grams(query)), key=len)
+        return {path for path in candidates if matches_search_text(self.texts[path], query, prefix_only)}
+
+
+# ====================================================
+# 画像デコード
+# ====================================================
+
+def fit_image_size(image_size, box_size):
+    """アスペクト比を維持して枠に収まるサイズを返します。(原寸より大きくはしない)"""
+    img_w, img_h = image_size
+    box_w, box_h = box_size
+    ratio = min(box_w / img_w, box_h / img_h, 1)
+    return max(1, int(img_w * ratio)), max(1, int(img_h * ratio))
+
+
+class MemoryViewReader(io.RawIOBase):
+    """memoryviewをコピーせずにファイルとして読むためのリーダー。
+
+    Pillowが要求した分だけを切り出して返すため、ページ全体のコピーは作られません。
+    """
+
+    def __init__(self, view):
+        self.view = view
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_CUR:
+            offset += self.position
+        elif whence == io.SEEK_END:
+            offset += len(self.view)
+        self.position = max(0, offset)
+        return self.position
+
+    def read(self, size=-1):
+        end = len(self.view) if size is None or size < 0 else min(len(self.view), self.position + size)
+        data = self.view[self.position:end].tobytes()
+        self.position = max(self.position, end)
+        return data
+
+    def readinto(self, buffer):
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def close(self):
+        if not self.closed:
+            self.view.release()
+        super().close()
+
+
+def decode_page_image(image_data, target_size=None):
+    """画像データをデコードします。
+
+    target_sizeを指定すると、表示サイズ以上を保てる範囲で縮小しながらデコードします。
+    JPEGはデコーダのドラフトモード (1/2, 1/4, 1/8 スケール) を使い、
+    それ以外の形式はデコード後に整数倍のreduce()で縮小します。
+    元画像のサイズは img.info['source_size'] に記録されます。
+    image_dataがmemoryview (mmapした無圧縮エントリ) の場合は、コピーせずにそのまま読み込みます。
+    """
+    import_pillow()
+    source = MemoryViewReader(image_data) if isinstance(image_data, memoryview) else io.BytesIO(image_data)
+    try:
+        # Pillowがwebpに対応しているため、Image.openで直接読み込めます。
+        img = Image.open(source)
+        source_size = img.size
+
+        fit_w, fit_h = fit_image_size(source_size, target_size) if target_size else source_size
+        if (fit_w, fit_h) == source_size:
+            # 表示サイズが原寸以上なら縮小デコードは行わない
+            img.load()
+        elif img.format == 'JPEG':
+            img.draft(None, (fit_w, fit_h))
+            img.load()
+        else:
+            img.load()
+            factor = min(img.width // fit_w, img.height // fit_h)
+            if factor >= 2:
+                img = img.reduce(factor)
+    finally:
+        # デコード後はmemoryviewを解放し、アーカイブのmmapを閉じられるようにする
+        source.close()
+
+    img.info['source_size'] = source_size
+    return img
+
+
+def is_decoded_enough(img, target_size):
+    """デコード済み画像が、指定サイズで表示するのに十分な解像度を持つか判定します。"""
+    source_size = img.info.get('source_size', img.size)
+    fit_w, fit_h = fit_image_size(source_size, target_size)
+    return img.width >= fit_w and img.height >= fit_h
+
+
+def is_wide_page(size):
+    """横長のページ (見開きをつなげて取り込んだページなど) か判定します。"""
+    width, height = size
+    return width > height
+
+
+def compose_spread(pages, target_size=None):
+    """ページを左から順に高さを揃えて並べ、表示サイズに収まる見開き画像を作成します。
+
+    連結した原寸のサイズは img.info['source_size'] に記録されます。
+    (fit_image_sizeで表示サイズを求めると、作成した画像のサイズと一致する)
+    """
+    import_pillow()
+    sizes = [page.info.get('source_size', page.size) for page in pages]
+    height = min(h for _, h in sizes) # 低いほうのページに高さを揃える
+    widths = [max(1, round(w * height / h)) for w, h in sizes]
+    source_size = (sum(widths), height)
+    spread_w, spread_h = fit_image_size(source_size, target_size) if target_size else source_size
+
+    spread = Image.new('RGB', (spread_w, spread_h), 'white')
+    x = 0
+    for i, (page, width) in enumerate(zip(pages, widths)):
+        # 端数は最後のページで吸収する
+        page_w = spread_w - x if i == len(pages) - 1 else max(1, round(width * spread_w / source_size[0]))
+        if page.mode != 'RGB':
+            page = page.convert('RGB')
+        if page.size != (page_w, spread_h):
+            page = page.resize((page_w, spread_h), Image.Resampling.LANCZOS)
+        spread.paste(page, (x, 0))
+        x += page_w
+
+    spread.info['source_size'] = source_size
+    return spread
+
+
+# ====================================================
+# 読書進捗の保存
+# ====================================================
+
+def write_json_atomic(path, data, **dump_options):
+    """一時ファイルに書き込んでから置き換えることで、JSONファイルを安全に保存します。"""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, **dump_options)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path) # 途中でクラッシュしても古いファイルか新しいファイルのどちらかが残る
+
+
+class ProgressStore:
+    """読書進捗 {ファイルパス: ページインデックス} を保持し、バックグラウンドでまとめて保存するクラス。
+
+    ページめくりごとの更新はメモリ上の辞書を書き換えるだけで、ファイルへの書き込みは
+    一定間隔で専用スレッドが行います。(クラッシュしても失うのは最大でその間隔分のみ)
+    """
+
+    def __init__(self, path, flush_interval=1.0, on_flush=None):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush           # 書き出し時に変更分 {ファイルパス: ページ} を受け取る関数
+        self.progress = {}
+        self.loaded = False                # ファイルから読み込み済みか (初回アクセス時に読み込む)
+        self.load_lock = threading.Lock()
+        self.changed = {}                  # 前回の書き出し以降に変更された進捗
+        self.dirty = False
+        self.lock = threading.Lock()       # 進捗辞書の保護
+        self.write_lock = threading.Lock() # ファイル書き込みの直列化
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def load(self):
+        """ファイルから進捗を読み込みます。"""
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    loaded = json.load(f)
+                with self.lock:
+                    self.progress = loaded
+            except Exception as e:
+                print(f"進捗ファイル読み込みエラー: {e}")
+        self.loaded = True
+
+    def ensure_loaded(self):
+        """まだ読み込んでいなければファイルから読み込みます。(起動時には読み込まず、最初に必要になったときに読む)"""
+        if not self.loaded:
+            with self.load_lock:
+                if not self.loaded:
+                    self.load()
+
+    def start(self):
+        """定期的に書き出すスレッドを開始します。"""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="progress-writer", daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        while not self.stop_event.wait(self.flush_interval):
+            self.flush()
+
+    def get(self, path, default=None):
+        self.ensure_loaded()
+        with self.lock:
+            return self.progress.get(path, default)
+
+    def __contains__(self, path):
+        self.ensure_loaded()
+        with self.lock:
+            return path in self.progress
+
+    def __getitem__(self, path):
+        self.ensure_loaded()
+        with self.lock:
+            return self.progress[path]
+
+    def __setitem__(self, path, index):
+        self.ensure_loaded()
+        with self.lock:
+            if self.progress.get(path) == index:
+                return
+            self.progress[path] = index
+            self.changed[path] = index
+            self.dirty = True
+
+    def items(self):
+        """(ファイルパス, ページインデックス) のリストを返します。"""
+        self.ensure_loaded()
+        with self.lock:
+            return list(self.progress.items())
+
+    def update(self, progress):
+        """複数の進捗をまとめて登録します。"""
+        self.ensure_loaded()
+        with self.lock:
+            self.progress.update(progress)
+            self.changed.update(progress)
+            self.dirty = True
+
+    def flush(self):
+        """変更があればファイルに書き出します。"""
+        with self.write_lock:
+            with self.lock:
+                if not self.dirty:
+                    return
+                snapshot = dict(self.progress)
+                changed, self.changed = self.changed, {}
+                self.dirty = False
+            try:
+                write_json_atomic(self.path, snapshot)
+            except Exception as e:
+                print(f"進捗ファイル書き込みエラー: {e}")
+                with self.lock:
+                    self.dirty = True # 次回の書き出しで再試行する
+            if self.on_flush and changed:
+                try:
+                    self.on_flush(changed)
+                except Exception as e:
+                    print(f"進捗の反映エラー: {e}")
+
+    def close(self):
+        """書き出しスレッドを停止し、未保存の進捗を書き出します。"""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.flush()
+
+
+# ====================================================
+# ライブラリインデックス (SQLite)
+# ====================================================
+
+def iter_book_files(folder, extensions, recursive=False, cancel_event=None):
+    """フォルダ内の書籍ファイルを列挙し、パス/名前/サイズ/更新日時のレコードを順次返します。
+
+    recursive=Trueの場合はサブフォルダも辿ります。cancel_eventがセットされると列挙を中断します。
+    """
+    pending_dirs = [folder]
+    while pending_dirs:
+        if cancel_event is not None and cancel_event.is_set():
+            return
+        current_dir = pending_dirs.pop()
+        try:
+            entries = os.scandir(current_dir)
+        except OSError as e:
+            if current_dir == folder:
+                raise
+            print(f"フォルダ読み込みエラー: {current_dir}: {e}")
+            continue
+        with entries:
+            for entry in entries:
+                if recursive and entry.is_dir(follow_symlinks=False):
+                    pending_dirs.append(entry.path)
+                elif entry.name.lower().endswith(extensions) and entry.is_file():
+                    # DirEntry.stat()はscandir時の情報を再利用できる (Windowsではシステムコール不要)
+                    stat_info = entry.stat()
+                    yield {
+                        'path': entry.path,
+                        'name': entry.name,
+                        'size_bytes': stat_info.st_size,
+                        'date_mod': stat_info.st_mtime,
+                    }
+
+
+def scan_book_files(folder, extensions, recursive=False):
+    """フォルダ内の書籍ファイルのレコードをリストで返します。"""
+    return list(iter_book_files(folder, extensions, recursive))
+
+
+def diff_book_snapshots(old_snapshot, new_snapshot):
+    """2つのスキャン結果 {パス: レコード} を (名前, サイズ, 更新日時) で比較し、差分イベントを返します。
+
+    イベントは ('added', レコード), ('removed', レコード), ('modified', レコード) のリストです。
+    """
+    events = []
+    for path, record in new_snapshot.items():
+        old_record = old_snapshot.get(path)
+        if old_record is None:
+            events.append(('added', record))
+        elif (old_record['name'], old_record['size_bytes'], old_record['date_mod']) != \
+                (record['name'], record['size_bytes'], record['date_mod']):
+            events.append(('modified', record))
+    for path, record in old_snapshot.items():
+        if path not in new_snapshot:
+            events.append(('removed', record))
+    return events
+
+
+def find_sorted_position(keys, key, reverse=False, after_equal=True):
+    """ソート済みのキーのリストに対する二分探索で、keyの挿入位置を返します。
+
+    reverse=Trueの場合は降順のリストとして扱います。after_equal=Trueなら等しいキーの後ろ
+    (bisect_right相当)、Falseなら前 (bisect_left相当) の位置を返します。
+    """
+    lo, hi = 0, len(keys)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        other = keys[mid]
+        if reverse:
+            goes_before = key > other or (not after_equal and key == other)
+        else:
+            goes_before = key < other or (not after_equal and key == other)
+        if goes_before:
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+
+class FolderWatcher:
+    """フォルダを定期的にスキャンし、前回のスキャン結果との差分を通知するクラス。
+
+    ファイルシステムの通知機能に依存せず、scandirのスナップショットを比較するポーリング方式です。
+    """
+
+    def __init__(self, folder, extensions, recursive, interval, on_events, baseline=()):
+        self.folder = folder
+        self.extensions = extensions
+        self.recursive = recursive
+        self.interval = interval
+        self.on_events = on_events         # 差分イベントのリストを受け取る関数 (監視スレッドから呼ばれる)
+        self.snapshot = {record['path']: record for record in baseline}
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="folder-watcher", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def poll(self):
+        """フォルダを再スキャンし、前回からの差分イベントを返します。"""
+        current = {
+            record['path']: record
+            for record in iter_book_files(self.folder, self.extensions, self.recursive, self.stop_event)
+        }
+        if self.stop_event.is_set():
+            return []
+        events = diff_book_snapshots(self.snapshot, current)
+        self.snapshot = current
+        return events
+
+    def _run(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                events = self.poll()
+                if events and not self.stop_event.is_set():
+                    self.on_events(events)
+            except Exception as e:
+                print(f"フォルダ監視エラー: {self.folder}: {e}")
+
+
+def count_archive_pages(file_path, image_extensions):
+    """アーカイブ内の画像ファイル数を返します。"""
+    with zipfile.ZipFile(file_path, 'r') as z:
+        return sum(1 for name in z.namelist() if name.lower().endswith(image_extensions))
+
+
+class LibraryIndex:
+    """書籍ごとのパス/サイズ/更新日時/ページ数/最後に読んだページを保持するSQLiteインデックス。
+
+    接続はスレッドごとに作成するため、バックグラウンドスレッドからも利用できます。
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.local = threading.local()
+        with self.connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS books (
+                    path TEXT PRIMARY KEY,
+                    folder TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime REAL NOT NULL,
+                    page_count INTEGER,
+                    last_page INTEGER
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS books_folder ON books(folder)")
+            # 整合性チェックの結果 (検証時のサイズ/更新日時と一致する間だけ有効)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS verifications (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime REAL NOT NULL,
+                    status TEXT NOT NULL,
+                    error TEXT,
+                    checked_at REAL NOT NULL
+                )
+            """)
+            # アーカイブのエントリ一覧 (read_archive_entries、保存時のサイズ/更新日時と一致する間だけ有効)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS archive_entries (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    entries TEXT NOT NULL
+                )
+            """)
+
+    def connect(self):
+        """現在のスレッド用の接続を返します。"""
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL") # 読み込みと書き込みを並行できるようにする
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    @staticmethod
+    def folder_condition(folder, recursive, column='folder'):
+        """フォルダ (recursive=Trueならサブフォルダを含む) を絞り込むWHERE句と引数を返します。"""
+        if not recursive:
+            return f"{column} = ?", (folder,)
+        # サブフォルダはパスの前方一致で検索 (LIKEは大文字小文字を区別しないため使わない)
+        prefix = os.path.join(folder, '')
+        return f"({column} = ? OR substr({column}, 1, ?) = ?)", (folder, len(prefix), prefix)
+
+    def get_folder(self, folder, recursive=False):
+        """フォルダ内の書籍レコードをインデックスから返します。
+
+        integrityは現在のファイルに対する整合性チェックの結果 ('ok'/'broken'、未検証ならNone) です。
+        """
+        condition, params = self.folder_condition(folder, recursive, 'b.folder')
+        rows = self.connect().execute(f"""
+            SELECT b.path, b.name, b.size, b.mtime, b.page_count, b.last_page, v.status
+            FROM books AS b
+            LEFT JOIN verifications AS v ON v.path = b.path AND v.size = b.size AND v.mtime = b.mtime
+            WHERE {condition}
+        """, params)
+        return [
+            {'path': path, 'name': name, 'size_bytes': size, 'date_mod': mtime,
+             'page_count': page_count, 'last_page': last_page, 'integrity': integrity}
+            for path, name, size, mtime, page_count, last_page, integrity in rows
+        ]
+
+    def reconcile(self, folder, scanned, recursive=False):
+        """スキャン結果とインデックスを照合し、サイズまたは更新日時が変わったものだけを更新します。
+
+        追加/変更されたパスのリストと、削除されたパスのリストを返します。
+        """
+        conn = self.connect()
+        condition, params = self.folder_condition(folder, recursive)
+        known = {
+            path: (size, mtime)
+            for path, size, mtime in conn.execute(f"SELECT path, size, mtime FROM books WHERE {condition}", params)
+        }
+        changed = [
+            (record['path'], os.path.dirname(record['path']), record['name'], record['size_bytes'], record['date_mod'])
+            for record in scanned
+            if known.get(record['path']) != (record['size_bytes'], record['date_mod'])
+        ]
+        scanned_paths = {record['path'] for record in scanned}
+        removed = [path for path in known if path not in scanned_paths]
+
+        with conn:
+            # 変更されたファイルはページ数を再計算するためNULLに戻す (最後に読んだページは維持)
+            conn.executemany("""
+                INSERT INTO books (path, folder, name, size, mtime, page_count) VALUES (?, ?, ?, ?, ?, NULL)
+                ON CONFLICT(path) DO UPDATE SET
+                    folder = excluded.folder, name = excluded.name,
+                    size = excluded.size, mtime = excluded.mtime, page_count = NULL
+            """, changed)
+            conn.executemany("DELETE FROM books WHERE path = ?", [(path,) for path in removed])
+            conn.executemany("DELETE FROM verifications WHERE path = ?", [(path,) for path in removed])
+            conn.executemany("DELETE FROM archive_entries WHERE path = ?", [(path,) for path in removed])
+
+        return [row[0] for row in changed], removed
+
+    def upsert_books(self, records):
+        """書籍レコードを追加または更新します。(ページ数はレコードの値で置き換える)"""
+        with self.connect() as conn:
+            conn.executemany("""
+                INSERT INTO books (path, folder, name, size, mtime, page_count) VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(path) DO UPDATE SET
+                    folder = excluded.folder, name = excluded.name, size = excluded.size,
+                    mtime = excluded.mtime, page_count = excluded.page_count
+            """, [
+                (record['path'], os.path.dirname(record['path']), record['name'],
+                 record['size_bytes'], record['date_mod'], record.get('page_count'))
+                for record in records
+            ])
+
+    def remove_books(self, paths):
+        """書籍レコードを削除します。"""
+        with self.connect() as conn:
+            conn.executemany("DELETE FROM books WHERE path = ?", [(path,) for path in paths])
+            conn.executemany("DELETE FROM verifications WHERE path = ?", [(path,) for path in paths])
+            conn.executemany("DELETE FROM archive_entries WHERE path = ?", [(path,) for path in paths])
+
+    def set_page_counts(self, page_counts):
+        """ページ数 {ファイルパス: ページ数} を記録します。"""
+        with self.connect() as conn:
+            conn.executemany("UPDATE books SET page_count = ? WHERE path = ?",
+                             [(count, path) for path, count in page_counts.items()])
+
+    def set_last_pages(self, last_pages):
+        """最後に読んだページ {ファイルパス: ページインデックス} を記録します。"""
+        with self.connect() as conn:
+            conn.executemany("UPDATE books SET last_page = ? WHERE path = ?",
+                             [(index, path) for path, index in last_pages.items()])
+
+    def set_verifications(self, results):
+        """整合性チェックの結果 (verify_archiveの戻り値のリスト) を記録します。"""
+        with self.connect() as conn:
+            conn.executemany("""
+                INSERT OR REPLACE INTO verifications (path, size, mtime, status, error, checked_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [
+                (result['path'], result['size_bytes'], result['date_mod'], result['status'], result['error'], time.time())
+                for result in results
+            ])
+
+    def get_archive_entries(self, path, size, mtime_ns):
+        """保存済みのエントリ一覧を返します。ファイルが保存時から変わっていればNoneを返します。"""
+        row = self.connect().execute(
+            "SELECT entries FROM archive_entries WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (path, size, mtime_ns)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_archive_entries(self, path, size, mtime_ns, entries):
+        """アーカイブのエントリ一覧を保存します。"""
+        with self.connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO archive_entries (path, size, mtime_ns, entries) VALUES (?, ?, ?, ?)",
+                (path, size, mtime_ns, json.dumps(entries, ensure_ascii=False, separators=(',', ':')))
+            )
+
+
+# ====================================================
+# アーカイブの整合性チェック
+# ====================================================
+
+def verify_archive(record, image_extensions):
+    """アーカイブの全エントリのCRCを確認し、画像エントリはヘッダーを解析できるか確認します。
+
+    プロセスプールから呼ばれるため、モジュールレベルの関数として定義しています。
+    エントリは最後まで読むとzipfileがCRCを照合するため、testzip()と同じ確認を
+    画像ヘッダーの確認と1回の読み込みで行います。
+    結果はレコードに status ('ok'/'broken') と error を加えた辞書です。
+    """
+    import_pillow()
+    result = {'path': record['path'], 'size_bytes': record['size_bytes'], 'date_mod': record['date_mod'],
+              'status': 'ok', 'error': None}
+    try:
+        with zipfile.ZipFile(record['path'], 'r') as z:
+            for info in z.infolist():
+                if info.is_dir():
+                    continue
+                data = z.read(info)  # CRCが一致しなければBadZipFileになる
+                if info.filename.lower().endswith(image_extensions):
+                    try:
+                        with Image.open(io.BytesIO(data)) as img:
+                            img.verify()
+                    except Exception as e:
+                        raise ValueError(f"{info.filename}: 画像として読み込めません ({e})")
+    except Exception as e:
+        result['status'] = 'broken'
+        result['error'] = str(e)
+    return result
+
+
+def iter_verification_results(records, image_extensions, workers=None, max_in_flight=4, cancel_event=None):
+    """書籍の整合性チェックをプロセスプールで実行し、完了した順に結果を返すジェネレータ。
+
+    同時に読み込む書籍の数をmax_in_flightに制限し、NASなどのディスクに
+    ランダムアクセスが集中しないようにします。(CPUのワーカー数とは別に指定)
+    """
+    from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+    pending_records = iter(records)
+    in_flight = set()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while True:
+            while len(in_flight) < max(1, max_in_flight) and not (cancel_event and cancel_event.is_set()):
+                record = next(pending_records, None)
+                if record is None:
+                    break
+                in_flight.add(executor.submit(verify_archive, record, image_extensions))
+            if not in_flight:
+                return
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+
+# ====================================================
+# 表紙サムネイル
+# ====================================================
+
+THUMBNAIL_SIZE = (120, 160) # サムネイルの最大サイズ
+
+
+def thumbnail_cache_path(cache_dir, file_path, size_bytes, date_mod):
+    """(パス, サイズ, 更新日時) から決まるサムネイルのキャッシュファイルのパスを返します。"""
+    digest = hashlib.sha1(f"{file_path}\0{size_bytes}\0{date_mod}".encode('utf-8')).hexdigest()
+    return os.path.join(cache_dir, digest[:2], digest + '.jpg')
+
+
+def generate_thumbnail(file_path, size_bytes, date_mod, cache_dir, image_extensions, thumb_size=THUMBNAIL_SIZE):
+    """書籍の最初の画像から表紙サムネイルを作成してキャッシュに保存し、そのパスを返します。
+
+    プロセスプールから呼ばれるため、モジュールレベルの関数として定義しています。
+    画像が含まれていない場合はNoneを返します。
+    """
+    cache_path = thumbnail_cache_path(cache_dir, file_path, size_bytes, date_mod)
+    if os.path.exists(cache_path):
+        return cache_path
+
+    with zipfile.ZipFile(file_path, 'r') as z:
+        images = [name for name in z.namelist() if name.lower().endswith(image_extensions)]
+        if not images:
+            return None
+        image_data = z.read(min(images, key=natural_sort_key))
+
+    img = decode_page_image(image_data, thumb_size)
+    img.thumbnail(thumb_size, Image.Resampling.LANCZOS)
+    if img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+
+    # 他のプロセスと同時に書き込んでも壊れないよう、一時ファイル経由で保存
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    img.save(tmp_path, 'JPEG', quality=85)
+    os.replace(tmp_path, cache_path)
+    return cache_path
+
+
+class ThumbnailService:
+    """サムネイル生成をプロセスプールで実行し、重複した要求をまとめるクラス。"""
+
+    def __init__(self, cache_dir, image_extensions, workers=None):
+        self.cache_dir = cache_dir
+        self.image_extensions = image_extensions
+        self.workers = workers
+        self.executor = None               # 最初の要求時に作成する
+        self.pending = {}                  # {ファイルパス: Future}
+        self.lock = threading.Lock()
+
+    def cached_path(self, file_path, size_bytes, date_mod):
+        """生成済みのサムネイルがあればそのパスを、なければNoneを返します。"""
+        cache_path = thumbnail_cache_path(self.cache_dir, file_path, size_bytes, date_mod)
+        return cache_path if os.path.exists(cache_path) else None
+
+    def request(self, file_path, size_bytes, date_mod, callback):
+        """サムネイル生成を要求します。完了時に callback(ファイルパス, キャッシュのパス) が呼ばれます。
+
+        callbackはプロセスプールの管理スレッドから呼ばれます。失敗した場合のパスはNoneです。
+        """
+        with self.lock:
+            if file_path in self.pending:
+                return
+            if self.executor is None:
+                # multiprocessingの読み込みは重いため、グリッド表示で初めて必要になったときに行う
+                from concurrent.futures import ProcessPoolExecutor
+                self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            future = self.executor.submit(
+                generate_thumbnail, file_path, size_bytes, date_mod, self.cache_dir, self.image_extensions
+            )
+            self.pending[file_path] = future
+
+        def on_done(done_future):
+            with self.lock:
+                self.pending.pop(file_path, None)
+            if done_future.cancelled():
+                return
+            try:
+                cache_path = done_future.result()
+            except Exception as e:
+                print(f"サムネイル作成エラー: {file_path}: {e}")
+                cache_path = None
+            callback(file_path, cache_path)
+
+        future.add_done_callback(on_done)
+
+    def retain(self, file_paths):
+        """指定されたもの以外の、まだ開始していない生成要求を取り消します。"""
+        wanted = set(file_paths)
+        with self.lock:
+            futures = [future for path, future in self.pending.items() if path not in wanted]
+        for future in futures:
+            future.cancel()
+
+    def shutdown(self):
+        """プロセスプールを停止します。"""
+        with self.lock:
+            executor, self.executor = self.executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ThumbnailGrid:
+    """書籍の表紙をグリッド表示するビュー。
+
+    表示範囲 (と前後1行) のセルだけを描画し、サムネイルもそのセルの分だけ要求します。
+    """
+
+    CELL_WIDTH = 140
+    CELL_HEIGHT = 200
+    PHOTO_CACHE_SIZE = 300 # メモリ上に保持するサムネイル (PhotoImage) の数
+
+    def __init__(self, parent, app):
+        self.app = app
+        self.canvas = tk.Canvas(parent, highlightthickness=0, bg=app.master.cget('bg'))
+        self.scrollbar = ttk.Scrollbar(parent, orient="vertical", command=self.on_scrollbar)
+        self.canvas.configure(yscrollcommand=self.scrollbar.set)
+        self.photos = OrderedDict()        # {ファイルパス: PhotoImage}
+        self.columns = 1
+        self.redraw_pending = False        # 届いたサムネイルの描き直しを予約済みか
+
+        self.canvas.bind('<Configure>', lambda e: self.refresh())
+        self.canvas.bind('<ButtonRelease-1>', self.on_click)
+        self.canvas.bind('<MouseWheel>', self.on_mouse_wheel)
+        self.canvas.bind('<Button-4>', self.on_mouse_wheel)
+        self.canvas.bind('<Button-5>', self.on_mouse_wheel)
+
+    def show(self):
+        self.canvas.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+        self.refresh()
+
+    def hide(self):
+        self.canvas.grid_remove()
+        self.scrollbar.grid_remove()
+
+    def is_visible(self):
+        return self.canvas.winfo_ismapped()
+
+    def refresh(self):
+        """書籍の数やウィンドウ幅に合わせてスクロール範囲を更新し、表示範囲を描き直します。"""
+        width = max(self.canvas.winfo_width(), self.CELL_WIDTH)
+        self.columns = max(1, width // self.CELL_WIDTH)
+        rows = (len(self.app.visible_files) + self.columns - 1) // self.columns
+        self.canvas.config(scrollregion=(0, 0, width, max(rows * self.CELL_HEIGHT, 1)))
+        self.draw_visible()
+
+    def on_scrollbar(self, *args):
+        self.canvas.yview(*args)
+        self.draw_visible()
+
+    def on_mouse_wheel(self, event):
+        if event.num == 4 or (event.delta > 0 and event.num != 5):
+            self.canvas.yview_scroll(-1, 'units')
+        else:
+            self.canvas.yview_scroll(1, 'units')
+        self.draw_visible()
+
+    def visible_range(self):
+        """表示範囲 (前後1行を含む) の書籍のインデックス範囲を返します。"""
+        top = self.canvas.canvasy(0)
+        bottom = top + self.canvas.winfo_height()
+        first_row = max(0, int(top // self.CELL_HEIGHT) - 1)
+        last_row = int(bottom // self.CELL_HEIGHT) + 1
+        start = first_row * self.columns
+        end = min(len(self.app.visible_files), (last_row + 1) * self.columns)
+        return start, end
+
+    def draw_visible(self):
+        """表示範囲内のセルだけを描画し、足りないサムネイルを要求します。
+
+        作成済みのサムネイルは要求時にまとめて読み込まれるため、描画は最後に一度だけ行います。
+        """
+        self.redraw_pending = False
+        start, end = self.visible_range()
+        visible_paths = self.app.visible_files[start:end]
+        self.app.request_thumbnails([path for path in visible_paths if path not in self.photos])
+        self.canvas.delete('cell')
+        for index, file_path in enumerate(visible_paths, start):
+            self.draw_cell(index, file_path)
+
+    def draw_cell(self, index, file_path):
+        """1冊分のセル (表紙と書籍名) を描画します。"""
+        row, col = divmod(index, self.columns)
+        x = col * self.CELL_WIDTH
+        y = row * self.CELL_HEIGHT
+        center_x = x + self.CELL_WIDTH // 2
+        thumb_w, thumb_h = THUMBNAIL_SIZE
+
+        is_current = file_path == self.app.current_file_path
+        self.canvas.create_rectangle(
+            x + 4, y + 4, x + self.CELL_WIDTH - 4, y + self.CELL_HEIGHT - 4,
+            outline='#4c9be8' if is_current else '', width=2, tags='cell'
+        )
+
+        photo = self.photos.get(file_path)
+        if photo is not None:
+            self.photos.move_to_end(file_path)
+            self.canvas.create_image(center_x, y + 8 + thumb_h // 2, image=photo, tags='cell')
+        else:
+            self.canvas.create_rectangle(
+                center_x - thumb_w // 2, y + 8, center_x + thumb_w // 2, y + 8 + thumb_h,
+                outline='gray', dash=(2, 2), tags='cell'
+            )
+
+        info = self.app.file_infos.get(file_path)
+        name = self.app.get_book_name(info['name'] if info else file_path)
+        self.canvas.create_text(
+            center_x, y + thumb_h + 16, text=name, width=self.CELL_WIDTH - 10,
+            fill=self.app.get_progress_color(file_path), font=('Helvetica', 9), anchor='n', tags='cell'
+        )
+
+    def set_thumbnail(self, file_path, photo, redraw=True):
+        """サムネイルを登録し、表示範囲内であれば描き直しを予約します。
+
+        続けて届いたサムネイルは、アイドル時の1回の描き直しにまとめます。
+        """
+        self.photos[file_path] = photo
+        self.photos.move_to_end(file_path)
+        while len(self.photos) > self.PHOTO_CACHE_SIZE:
+            self.photos.popitem(last=False)
+        if not redraw or self.redraw_pending:
+            return
+        start, end = self.visible_range()
+        if file_path in self.app.visible_files[start:end]:
+            self.redraw_pending = True
+            self.canvas.after_idle(self.draw_visible)
+
+    def on_click(self, event):
+        """クリックされたセルの書籍を開きます。"""
+        col = int(self.canvas.canvasx(event.x) // self.CELL_WIDTH)
+        row = int(self.canvas.canvasy(event.y) // self.CELL_HEIGHT)
+        index = row * self.columns + col
+        if col < self.columns and 0 <= index < len(self.app.visible_files):
+            self.app.open_book(self.app.visible_files[index])
+            self.draw_visible()
+
+
+class VirtualFileList:
+    """10万冊以上でも応答性を保つための仮想化ファイルリスト。
+
+    書籍ごとのウィジェット (Treeviewの行) は作らず、表示範囲の行数分だけの描画アイテムを
+    使い回して、スクロール位置に応じた内容に書き換えます。スクロールと選択の処理量は
+    書籍数に依存しません。
+    """
+
+    ROW_HEIGHT = 22
+    # (列名, 見出し, 幅) 幅がNoneの列は残りの幅を使う
+    COLUMNS = (('name', 'ファイル名', None), ('pages', '頁数', 45), ('size', 'サイズ', 70), ('date', '更新日', 110))
+    SELECTED_COLOR = '#2b3e50'
+
+    def __init__(self, parent, app):
+        self.app = app
+        self.frame = ttk.Frame(parent)
+        self.frame.grid_columnconfigure(0, weight=1)
+        self.frame.grid_rowconfigure(0, weight=1)
+        self.canvas = tk.Canvas(self.frame, highlightthickness=0, bg=app.master.cget('bg'), takefocus=1)
+        self.scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self.on_scrollbar)
+        self.canvas.grid(row=0, column=0, sticky="nsew")
+        self.scrollbar.grid(row=0, column=1, sticky="ns")
+
+        self.top_index = 0                 # 先頭に表示している書籍のインデックス
+        self.rows = []                     # 使い回す行の描画アイテム [(背景ID, {列名: テキストID})]
+        self.column_x = {}                 # {列名: (左端のx座標, 幅)}
+        self.header_ids = []
+
+        self.canvas.bind('<Configure>', self.on_resize)
+        self.canvas.bind('<ButtonRelease-1>', self.on_click)
+        self.canvas.bind('<MouseWheel>', self.on_mouse_wheel)
+        self.canvas.bind('<Button-4>', self.on_mouse_wheel)
+        self.canvas.bind('<Button-5>', self.on_mouse_wheel)
+        self.canvas.bind('<Up>', lambda e: self.move_selection(-1))
+        self.canvas.bind('<Down>', lambda e: self.move_selection(1))
+        self.canvas.bind('<Return>', lambda e: self.open_selected())
+        self.selected_index = None
+
+    def show(self):
+        self.frame.grid(row=0, column=0, columnspan=2, sticky="nsew")
+        self.render()
+
+    def hide(self):
+        self.frame.grid_remove()
+
+    def is_visible(self):
+        return self.frame.winfo_ismapped()
+
+    def visible_row_count(self):
+        return max(1, (self.canvas.winfo_height() - self.ROW_HEIGHT) // self.ROW_HEIGHT)
+
+    def on_resize(self, event=None):
+        """ウィンドウサイズに合わせて列の位置と行アイテムの数を調整します。"""
+        width = self.canvas.winfo_width()
+        fixed = sum(col_width for _, _, col_width in self.COLUMNS if col_width)
+        x = 4
+        for name, _, col_width in self.COLUMNS:
+            col_width = col_width or max(60, width - fixed - 8)
+            self.column_x[name] = (x, col_width)
+            x += col_width
+
+        # 見出し行
+        for item_id in self.header_ids:
+            self.canvas.delete(item_id)
+        self.header_ids = [
+            self.canvas.create_text(self.text_x(name), self.ROW_HEIGHT // 2, text=title,
+                                    anchor=self.text_anchor(name), fill='gray', font=('Helvetica', 9, 'bold'))
+            for name, title, _ in self.COLUMNS
+        ]
+
+        # 表示可能な行数 + 1 の行アイテムだけを保持する (足りなければ作成、余れば削除)
+        needed = self.visible_row_count() + 1
+        while len(self.rows) < needed:
+            y = (len(self.rows) + 1) * self.ROW_HEIGHT
+            background = self.canvas.create_rectangle(0, y, width, y + self.ROW_HEIGHT, outline='', fill='')
+            texts = {
+                name: self.canvas.create_text(self.text_x(name), y + self.ROW_HEIGHT // 2, text='',
+                                              anchor=self.text_anchor(name), font=('Helvetica', 10))
+                for name, _, _ in self.COLUMNS
+            }
+            self.rows.append((background, texts))
+        while len(self.rows) > needed:
+            background, texts = self.rows.pop()
+            self.canvas.delete(background, *texts.values())
+
+        for row, (background, texts) in enumerate(self.rows):
+            y = (row + 1) * self.ROW_HEIGHT
+            self.canvas.coords(background, 0, y, width, y + self.ROW_HEIGHT)
+            for name, text_id in texts.items():
+                self.canvas.coords(text_id, self.text_x(name), y + self.ROW_HEIGHT // 2)
+        self.render()
+
+    def text_x(self, name):
+        x, col_width = self.column_x.get(name, (0, 0))
+        return x if name == 'name' else x + col_width - 6
+
+    def text_anchor(self, name):
+        return 'w' if name in ('name', 'date') else 'e'
+
+    def render(self):
+        """現在のスクロール位置の行だけを描画アイテムに書き込みます。"""
+        files = self.app.visible_files
+        total = len(files)
+        visible = self.visible_row_count()
+        self.top_index = max(0, min(self.top_index, total - visible))
+        name_width = self.column_x.get('name', (0, 200))[1]
+        max_chars = max(4, name_width // 8)
+
+        for row, (background, texts) in enumerate(self.rows):
+            index = self.top_index + row
+            if index >= total:
+                self.canvas.itemconfigure(background, fill='')
+                for text_id in texts.values():
+                    self.canvas.itemconfigure(text_id, text='')
+                continue
+
+            file_path = files[index]
+            info = self.app.file_infos.get(file_path)
+            name = info['name'] if info else os.path.basename(file_path)
+            if len(name) > max_chars:
+                name = name[:max_chars - 1] + '…'
+            is_selected = index == self.selected_index or file_path == self.app.current_file_path
+            color = self.app.get_progress_color(file_path)
+            self.canvas.itemconfigure(background, fill=self.SELECTED_COLOR if is_selected else '')
+            pages_str, size_str, date_str = self.app.get_display_values(info) if info else ('', '', '')
+            self.canvas.itemconfigure(texts['name'], text=name, fill=color)
+            self.canvas.itemconfigure(texts['pages'], text=pages_str, fill=color)
+            self.canvas.itemconfigure(texts['size'], text=size_str, fill=color)
+            self.canvas.itemconfigure(texts['date'], text=date_str, fill=color)
+
+        if total:
+            self.scrollbar.set(self.top_index / total, min(1.0, (self.top_index + visible) / total))
+        else:
+            self.scrollbar.set(0, 1)
+
+    def on_scrollbar(self, action, amount, unit=None):
+        """スクロールバーの操作に合わせて先頭行を移動します。"""
+        if action == 'moveto':
+            self.top_index = int(float(amount) * len(self.app.visible_files))
+        elif unit == 'pages':
+            self.top_index += int(amount) * self.visible_row_count()
+        else:
+            self.top_index += int(amount)
+        self.render()
+
+    def on_mouse_wheel(self, event):
+        step = -3 if event.num == 4 or (event.delta > 0 and event.num != 5) else 3
+        self.top_index += step
+        self.render()
+
+    def on_click(self, event):
+        """クリックされた行の書籍を開きます。"""
+        self.canvas.focus_set()
+        row = event.y // self.ROW_HEIGHT - 1
+        index = self.top_index + row
+        if row >= 0 and index < len(self.app.visible_files):
+            self.selected_index = index
+            self.render()
+            self.open_selected()
+
+    def move_selection(self, delta):
+        """キーボードで選択行を移動し、必要なら表示範囲をスクロールします。"""
+        if not self.app.visible_files:
+            return
+        current = self.selected_index if self.selected_index is not None else self.top_index - delta
+        self.selected_index = max(0, min(len(self.app.visible_files) - 1, current + delta))
+        visible = self.visible_row_count()
+        if self.selected_index < self.top_index:
+            self.top_index = self.selected_index
+        elif self.selected_index >= self.top_index + visible:
+            self.top_index = self.selected_index - visible + 1
+        self.render()
+
+    def open_selected(self):
+        if self.selected_index is not None and self.selected_index < len(self.app.visible_files):
+            self.app.open_book(self.app.visible_files[self.selected_index])
+            self.render()
+
+    def reset(self):
+        """フォルダや検索語が変わったときにスクロール位置と選択を初期化します。"""
+        self.top_index = 0
+        self.selected_index = None
+
+
+# ====================================================
+# ページ先読み (プリフェッチ)
+# ====================================================
+
+class PagePrefetcher:
+    """現在のページの前後をワーカースレッドで読み込み・デコードしておくクラス。"""
+
+    def __init__(self, loader, workers=2):
+        self.loader = loader               # (ファイルパス, 画像名, 表示サイズ) -> デコード済みPIL.Image
+        self.workers = max(1, int(workers))
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="prefetch")
+        self.futures = {}                  # {(ファイルパス, 画像名): Future}
+        self.lock = threading.Lock()
+
+    def configure(self, workers):
+        """ワーカー数が変更された場合はスレッドプールを作り直します。"""
+        workers = max(1, int(workers))
+        if workers == self.workers:
+            return
+        with self.lock:
+            old_executor = self.executor
+            self.workers = workers
+            self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="prefetch")
+            self.futures = {}
+        old_executor.shutdown(wait=False, cancel_futures=True)
+
+    def schedule(self, file_path, image_names, target_size=None):
+        """指定された画像群を先読みし、それ以外の未着手ジョブは破棄します。"""
+        wanted = [(file_path, name) for name in image_names]
+        with self.lock:
+            for key in list(self.futures):
+                if key not in wanted:
+                    # 実行中のジョブはキャンセルできないが、結果は破棄される
+                    self.futures.pop(key).cancel()
+            for key in wanted:
+                if key not in self.futures:
+                    self.futures[key] = self.executor.submit(self.loader, *key, target_size)
+
+    def take(self, file_path, image_name):
+        """先読み済み (または読み込み中) の画像を返します。なければNoneを返します。"""
+        with self.lock:
+            future = self.futures.get((file_path, image_name))
+        if future is None or future.cancelled():
+            return None
+        # 読み込み中の場合は完了を待つ (同じページを二重にデコードしないため)
+        return future.result()
+
+    def shutdown(self):
+        """スレッドプールを停止します。"""
+        with self.lock:
+            self.futures = {}
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+# ====================================================
+# アーカイブハンドルのプール
+# ====================================================
+
+def read_archive_entries(zf):
+    """ZipFileのエントリを自然順に並べた [名前, ヘッダー位置, 圧縮サイズ, サイズ, 圧縮方式, CRC] のリストを返します。
+
+    暗号化されたエントリは圧縮方式をNoneとし、読み込みはzipfileに任せます。
+    """
+    entries = [
+        [info.filename, info.header_offset, info.compress_size, info.file_size,
+         None if info.flag_bits & 0x1 else info.compress_type, info.CRC]
+        for info in zf.infolist() if not info.is_dir()
+    ]
+    entries.sort(key=lambda entry: natural_sort_key(entry[0]))
+    return entries
+
+
+class ArchiveHandle:
+    """プール内で保持される、開いたアーカイブとその検証情報。
+
+    エントリ一覧 (read_archive_entries) が渡された場合はセントラルディレクトリを解析せず、
+    ヘッダー位置から直接エントリを読み込みます。ZipFileは必要になったときだけ開きます。
+    """
+
+    def __init__(self, path, signature, entries=None):
+        self.path = path
+        self.signature = signature         # (mtime, サイズ) 変更検出用
+        self.lock = threading.RLock()      # mmap/ZipFileの遅延オープンと、ZipFileでの読み込みを直列化するロック
+        self.closed = False
+        self.zip_file = None
+        self.mapped = None                 # アーカイブ全体のmmap (エントリの直接読み込み時に作成)
+        self.page_lists = {}               # {拡張子のタプル: 自然順の画像エントリ名リスト} (初回要求時に作成)
+        self.parsed = entries is None      # セントラルディレクトリを解析したか (エントリ一覧の保存が必要か)
+        if entries is None:
+            self.zip_file = zipfile.ZipFile(path, 'r')
+            entries = read_archive_entries(self.zip_file)
+        self.entries = entries
+        self.entry_map = {entry[0]: entry for entry in entries}
+
+    @property
+    def zip(self):
+        """ZipFile (エントリ一覧から読めない場合の代替用。初回アクセス時に開く)"""
+        with self.lock:
+            if self.zip_file is None:
+                self.zip_file = zipfile.ZipFile(self.path, 'r')
+            return self.zip_file
+
+    def page_list(self, image_extensions):
+        """画像エントリ名を自然順に並べたリストを返します。"""
+        page_list = self.page_lists.get(image_extensions)
+        if page_list is None:
+            page_list = self.page_lists[image_extensions] = [
+                entry[0] for entry in self.entries if entry[0].lower().endswith(image_extensions)
+            ]
+        return page_list
+
+    def map_view(self):
+        """アーカイブ全体のmmapのmemoryviewを返します。(初回にmmapを作成、閉じられていればNone)
+
+        memoryviewを保持している間はmmapが閉じられないため、ロックはここだけで取得します。
+        """
+        with self.lock:
+            if self.closed:
+                return None
+            if self.mapped is None:
+                with open(self.path, 'rb') as f:
+                    self.mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return memoryview(self.mapped)
+
+    def entry_view(self, whole, entry):
+        """エントリの (圧縮された) データ部分を、mmapのmemoryview (whole) から切り出して返します。
+
+        ローカルヘッダーが読めない場合はNoneを返します。
+        """
+        _, header_offset, compress_size, _, _, _ = entry
+        # ローカルファイルヘッダー (30バイト + ファイル名 + 拡張フィールド) の後ろがデータ
+        header = whole[header_offset:header_offset + 30].tobytes()
+        if len(header) < 30 or header[:4] != b'PK\x03\x04':
+            return None
+        name_length, extra_length = struct.unpack('<HH', header[26:30])
+        start = header_offset + 30 + name_length + extra_length
+        if start + compress_size > len(whole):
+            return None
+        return whole[start:start + compress_size]
+
+    def read_entry(self, name):
+        """エントリを読み込みます。無圧縮ならmemoryview、それ以外は展開したbytesを返します。
+
+        mmapからの読み込みはファイル位置を共有しないため、ロックはmmapの作成時だけ取得し、
+        同じ本のページを複数のスレッドから並行して読み込めます。(展開もロックの外で行う)
+        どちらの場合もCRCを照合し、一致しなければBadZipFileを送出します。
+        ハンドルが閉じられていた場合はNoneを返します。
+        """
+        entry = self.entry_map.get(name)
+        view = None
+        if entry is not None and entry[4] in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            whole = self.map_view()
+            if whole is None:
+                return None
+            with whole:
+                view = self.entry_view(whole, entry)
+        if view is None:
+            # 無圧縮/Deflate以外のエントリなどはZipFileで読む (ファイル位置を共有するためロックする)
+            with self.lock:
+                return None if self.closed else self.zip.read(name)
+
+        _, _, _, file_size, compress_type, crc = entry
+        if compress_type == zipfile.ZIP_STORED:
+            # crc32はmemoryviewをそのまま読むため、コピーは作らない
+            if len(view) != file_size or zlib.crc32(view) != crc:
+                view.release()
+                raise zipfile.BadZipFile(f"Bad CRC-32 for file {name!r}")
+            return view
+        with view:
+            data = zlib.decompress(view, -zlib.MAX_WBITS, max(file_size, 1))
+        if len(data) != file_size or zlib.crc32(data) != crc:
+            raise zipfile.BadZipFile(f"Bad CRC-32 for file {name!r}")
+        return data
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            if self.zip_file is not None:
+                self.zip_file.close()
+            if self.mapped is not None:
+                try:
+                    self.mapped.close()
+                except BufferError:
+                    pass # デコード中のページがあれば、そのmemoryviewの解放後に自動で閉じられる
+                self.mapped = None
+
+
+class ArchivePool:
+    """開いたアーカイブを使い回すLRUプール。(セントラルディレクトリの再解析を避ける)
+
+    entry_cacheにLibraryIndexを渡すと、エントリ一覧をパス/サイズ/更新日時ごとに保存し、
+    アプリを再起動した後も、一度開いた本はセントラルディレクトリを解析せずに開けます。
+    """
+
+    def __init__(self, max_handles=4, entry_cache=None):
+        self.max_handles = max(1, int(max_handles))
+        self.handles = OrderedDict()       # {ファイルパス: ArchiveHandle}
+        self.lock = threading.Lock()
+        self.entry_cache = entry_cache
+
+    def acquire(self, path):
+        """パスに対応するハンドルを返します。ファイルが更新されていれば開き直します。"""
+        stat_info = os.stat(path)
+        signature = (stat_info.st_mtime_ns, stat_info.st_size)
+
+        with self.lock:
+            handle = self.handles.get(path)
+            if handle is not None and handle.signature == signature:
+                self.handles.move_to_end(path)
+                return handle
+
+        # ZIPのオープン (セントラルディレクトリ解析) はプールのロック外で行う
+        new_handle = self.open_handle(path, signature)
+        evicted = []
+        with self.lock:
+            handle = self.handles.get(path)
+            if handle is not None and handle.signature == signature:
+                # 別スレッドが先に開いた場合はそちらを使う
+                evicted.append(new_handle)
+            else:
+                if handle is not None:
+                    evicted.append(handle)
+                handle = self.handles[path] = new_handle
+            self.handles.move_to_end(path)
+            while len(self.handles) > self.max_handles:
+                evicted.append(self.handles.popitem(last=False)[1])
+
+        for old_handle in evicted:
+            old_handle.close()
+        return handle
+
+    def open_handle(self, path, signature):
+        """ハンドルを作成します。保存済みのエントリ一覧があればセントラルディレクトリを解析しません。"""
+        mtime_ns, size = signature
+        entries = None
+        if self.entry_cache is not None:
+            try:
+                entries = self.entry_cache.get_archive_entries(path, size, mtime_ns)
+            except sqlite3.Error:
+                entries = None # キャッシュが読めなければ通常どおり解析する
+        handle = ArchiveHandle(path, signature, entries)
+        if handle.parsed and self.entry_cache is not None:
+            try:
+                self.entry_cache.set_archive_entries(path, size, mtime_ns, handle.entries)
+            except sqlite3.Error:
+                pass
+        return handle
+
+    def namelist(self, path):
+        """アーカイブ内のエントリ名 (ディレクトリを除く) を自然順に返します。"""
+        return [entry[0] for entry in self.acquire(path).entries]
+
+    def page_list(self, path, image_extensions):
+        """アーカイブ内の画像エントリ名を自然順にソートしたリストを返します。
+
+        エントリ一覧は作成時に自然順にソート済みのため、拡張子で絞り込むだけです。
+        結果はハンドルと一緒に保持します。
+        (ファイルが更新されるとハンドルごと作り直されるため、キャッシュも無効になる)
+        """
+        return self.acquire(path).page_list(image_extensions)
+
+    def read_buffer(self, path, name):
+        """ページのデータを読み込みます。(スレッドセーフ)
+
+        無圧縮エントリはmmapしたアーカイブのmemoryviewを返し、コピーを作りません。
+        圧縮されたエントリは展開したbytesを返します。
+        (どちらもCRCを照合し、破損していればBadZipFileを送出する)
+        """
+        while True:
+            data = self.acquire(path).read_entry(name)
+            # 読み込み直前に追い出されていた場合は取り直す
+            if data is not None:
+                return data
+
+    def configure(self, max_handles):
+        """保持するハンドルの最大数を変更します。"""
+        with self.lock:
+            self.max_handles = max(1, int(max_handles))
+            evicted = []
+            while len(self.handles) > self.max_handles:
+                evicted.append(self.handles.popitem(last=False)[1])
+        for handle in evicted:
+            handle.close()
+
+    def close_all(self):
+        """全てのハンドルを閉じます。"""
+        with self.lock:
+            handles = list(self.handles.values())
+            self.handles.clear()
+        for handle in handles:
+            handle.close()
+
+
+# ====================================================
+# ページキャッシュ
+# ====================================================
+
+class PageCache:
+    """デコード済み画像と表示用リサイズ画像を、合計メモリ量の上限で管理するLRUキャッシュ。"""
+
+    TIERS = ('decoded', 'resized')
+
+    def __init__(self, budget_mb=512):
+        self.budget_bytes = int(budget_mb * 1024 * 1024)
+        self.entries = OrderedDict()       # {(ティア, キー): (値, バイト数)}
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.stats = {tier: {'hits': 0, 'misses': 0} for tier in self.TIERS}
+        # PhotoImageはメインスレッド以外で破棄できないため、追い出した分はここで保持する
+        self.pending_release = []
+
+    @staticmethod
+    def image_nbytes(img):
+        """PIL.ImageまたはPhotoImageのおおよそのメモリ使用量を返します。"""
+        if isinstance(img, Image.Image):
+            return img.width * img.height * len(img.getbands())
+        return img.width() * img.height() * 4
+
+    def get(self, tier, key, record_stats=True):
+        """キャッシュから値を取得します。なければNoneを返します。"""
+        with self.lock:
+            entry = self.entries.get((tier, key))
+            if entry is not None:
+                self.entries.move_to_end((tier, key))
+            if record_stats:
+                self.stats[tier]['hits' if entry is not None else 'misses'] += 1
+        return entry[0] if entry is not None else None
+
+    def put(self, tier, key, value):
+        """値をキャッシュに追加し、上限を超えた分を古い順に追い出します。"""
+        nbytes = self.image_nbytes(value)
+        if nbytes > self.budget_bytes:
+            return # 単体で上限を超えるものはキャッシュしない
+
+        with self.lock:
+            old_entry = self.entries.pop((tier, key), None)
+            if old_entry is not None:
+                self.total_bytes -= old_entry[1]
+                self._release(tier, old_entry[0])
+            self.entries[(tier, key)] = (value, nbytes)
+            self.total_bytes += nbytes
+            self._evict()
+
+    def _evict(self):
+        while self.total_bytes > self.budget_bytes and self.entries:
+            (tier, _), (value, nbytes) = self.entries.popitem(last=False)
+            self.total_bytes -= nbytes
+            self._release(tier, value)
+
+    def _release(self, tier, value):
+        if tier == 'resized':
+            self.pending_release.append(value)
+
+    def release_pending(self):
+        """追い出されたPhotoImageを破棄します。(メインスレッドから呼ぶこと)"""
+        with self.lock:
+            self.pending_release = []
+
+    def set_budget(self, budget_mb):
+        """メモリ上限 (MB) を変更します。"""
+        with self.lock:
+            self.budget_bytes = int(budget_mb * 1024 * 1024)
+            self._evict()
+
+    def clear(self):
+        """全てのエントリを破棄します。"""
+        with self.lock:
+            self.pending_release.extend(value for value, _ in self.entries.values())
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def get_stats(self):
+        """ティアごとのヒット/ミス数と現在のメモリ使用量を返します。"""
+        with self.lock:
+            stats = {tier: dict(counts) for tier, counts in self.stats.items()}
+            stats['total_mb'] = self.total_bytes / (1024 * 1024)
+            stats['budget_mb'] = self.budget_bytes / (1024 * 1024)
+        return stats
+
+
+# ====================================================
+# 拡大表示のタイル
+# ====================================================
+
+class TilePyramid:
+    """大きなページ画像を拡大表示するための、タイル分割。
+
+    画像は表示倍率に必要な解像度のもの (縮小デコードした画像) を1枚だけ保持し、
+    座標は原寸 (image.info['source_size']) を基準に扱います。
+    表示倍率ごとのタイル (TILE_SIZE四方) はその画像から切り出して作り、
+    LRUで上限枚数まで保持します。(上限は表示範囲のタイル数に合わせて設定する)
+    縮小したときは drop_finer で画像も縮小し、必要以上の解像度を保持し続けないようにします。
+    """
+
+    TILE_SIZE = 256
+
+    def __init__(self, image, max_tiles=64):
+        self.source_size = image.info.get('source_size', image.size)
+        self.image = image
+        self.tiles = OrderedDict()         # {(倍率, 列, 行): PIL.Image}
+        self.max_tiles = max_tiles
+
+    def display_size(self, scale):
+        """倍率scaleで表示したときの画像サイズを返します。"""
+        width, height = self.source_size
+        return max(1, round(width * scale)), max(1, round(height * scale))
+
+    def has_resolution(self, scale):
+        """倍率scaleの表示に十分な解像度の画像を持っているか返します。(原寸より大きい倍率は原寸で十分)"""
+        width, height = self.display_size(min(scale, 1.0))
+        # 縮小デコードの端数で1px小さくなる分は許容する
+        return self.image.width >= width - 1 and self.image.height >= height - 1
+
+    def drop_finer(self, scale):
+        """画像が倍率scaleの表示に必要な解像度の2倍以上あれば、整数倍で縮小して差し替えます。"""
+        width, height = self.display_size(min(scale, 1.0))
+        factor = min(self.image.width // width, self.image.height // height)
+        if factor >= 2:
+            self.image = self.image.reduce(factor)
+
+    def tile_range(self, scale, origin, viewport_size):
+        """表示範囲に重なるタイルの (列, 行) を返します。originは画像の左上のキャンバス座標です。"""
+        width, height = self.display_size(scale)
+        size = self.TILE_SIZE
+        left, top = max(0, -origin[0]), max(0, -origin[1])
+        right = min(width, viewport_size[0] - origin[0])
+        bottom = min(height, viewport_size[1] - origin[1])
+        if right <= left or bottom <= top:
+            return []
+        return [
+            (column, row)
+            for row in range(top // size, (bottom - 1) // size + 1)
+            for column in range(left // size, (right - 1) // size + 1)
+        ]
+
+    def get_tile(self, scale, column, row):
+        """倍率scaleで表示したときの (列, 行) のタイル画像を返します。"""
+        key = (scale, column, row)
+        tile = self.tiles.get(key)
+        if tile is not None:
+            self.tiles.move_to_end(key)
+            return tile
+
+        image = self.image
+        width, height = self.display_size(scale)
+        size = self.TILE_SIZE
+        x0, y0 = column * size, row * size
+        x1, y1 = min(x0 + size, width), min(y0 + size, height)
+        # 表示座標を保持している画像の座標に変換し、その範囲だけをリサンプルする
+        ratio_x = image.width / width
+        ratio_y = image.height / height
+        box = (x0 * ratio_x, y0 * ratio_y, min(x1 * ratio_x, image.width), min(y1 * ratio_y, image.height))
+        tile = image.resize((x1 - x0, y1 - y0), Image.Resampling.BILINEAR, box=box)
+
+        self.tiles[key] = tile
+        while len(self.tiles) > self.max_tiles:
+            self.tiles.popitem(last=False)
+        return tile
+
+
+# ====================================================
+# 処理時間の計測
+# ====================================================
+
+class LatencyTimer:
+    """with文で囲んだ区間の経過時間をLatencyStatsに記録するタイマー。"""
+    __slots__ = ('stats', 'stage', 'start')
+
+    def __init__(self, stats, stage):
+        self.stats = stats
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stats.record(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class NullTimer:
+    """計測が無効なときに使う、何もしないタイマー。"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_TIMER = NullTimer()
+
+
+class LatencyStats:
+    """処理の段階ごとの所要時間を、直近の一定数だけ保持して集計します。
+
+    無効なときのmeasure()は共有の何もしないタイマーを返すだけなので、
+    ホットパスに計測を入れたままでもほぼコストはかかりません。
+    記録はワーカースレッドからも行われます。(dequeへの追加はスレッドセーフ)
+    """
+
+    def __init__(self, window=1000):
+        self.enabled = False
+        self.window = window               # 段階ごとに保持する直近の計測数
+        self.samples = {}                  # {段階名: deque(経過秒数)}
+
+    def measure(self, stage):
+        """with文で使うタイマーを返します。"""
+        if not self.enabled:
+            return NULL_TIMER
+        return LatencyTimer(self, stage)
+
+    def record(self, stage, seconds):
+        """経過時間を記録します。"""
+        samples = self.samples.get(stage)
+        if samples is None:
+            samples = self.samples.setdefault(stage, deque(maxlen=self.window))
+        samples.append(seconds)
+
+    def clear(self):
+        self.samples = {}
+
+    def summary(self):
+        """段階ごとの件数とp50/p95/p99/最大/平均 (ミリ秒) を返します。"""
+        result = {}
+        for stage, samples in sorted(self.samples.items()):
+            values = sorted(samples)
+            if not values:
+                continue
+
+            def percentile(ratio):
+                return values[min(len(values) - 1, int(ratio * len(values)))] * 1000
+
+            result[stage] = {
+                'count': len(values),
+                'p50_ms': round(percentile(0.50), 3),
+                'p95_ms': round(percentile(0.95), 3),
+                'p99_ms': round(percentile(0.99), 3),
+                'max_ms': round(values[-1] * 1000, 3),
+                'mean_ms': round(sum(values) / len(values) * 1000, 3),
+            }
+        return result
+
+    def export(self, path):
+        """集計結果をファイルに書き出します。(拡張子が.csvならCSV、それ以外はJSON)"""
+        summary = self.summary()
+        if path.lower().endswith('.csv'):
+            columns = ['count', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms', 'mean_ms']
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['stage'] + columns)
+                for stage, values in summary.items():
+                    writer.writerow([stage] + [values[column] for column in columns])
+        else:
+            write_json_atomic(path, summary, indent=2)
+
+
+class StartupProfile:
+    """起動処理の段階ごとの経過時間を記録します。(モジュールの読み込み開始からの時間)"""
+    TARGET_MS = 300 # 操作できるウィンドウが表示されるまでの目標時間
+
+    def __init__(self, verbose=False):
+        self.verbose = verbose
+        self.marks = []                    # [(段階名, perf_counterの値)]
+
+    def mark(self, name):
+        self.marks.append((name, time.perf_counter()))
+
+    def report(self):
+        """段階ごとの所要時間と累計を、表形式の文字列で返します。"""
+        lines = ["起動時間:"]
+        previous = STARTUP_BEGIN
+        for name, timestamp in self.marks:
+            lines.append(f"  {name:<16}{(timestamp - previous) * 1000:8.1f} ms  (累計 {(timestamp - STARTUP_BEGIN) * 1000:7.1f} ms)")
+            previous = timestamp
+        total_ms = (previous - STARTUP_BEGIN) * 1000
+        verdict = "OK" if total_ms <= self.TARGET_MS else "目標超過"
+        lines.append(f"  合計 {total_ms:.1f} ms (目標 {self.TARGET_MS} ms: {verdict})")
+        return "\n".join(lines)
 
-# Note: このコードを実行するには、以下のライブラリが必要です。
-# pip install ttkbootstrap Pillow
 
 class BookManagerApp:
-    def __init__(self, master):
+    ANIMATION_FRAME_MS = 16 # アニメーションのフレーム間隔 (約60fps)
+    UI_QUEUE_POLL_MS = 30   # バックグラウンド処理の結果を確認する間隔
+    PAGE_COUNT_BATCH = 200  # ページ数をファイルリストに反映する単位
+    SCAN_BATCH = 200        # スキャン結果をファイルリストに追加する単位
+    ZOOM_STEP = 1.25        # 拡大/縮小1回あたりの倍率
+    ZOOM_MAX = 4.0          # 拡大表示の最大倍率 (原寸比)
+    LATENCY_OVERLAY_MS = 500 # 処理時間のオーバーレイを更新する間隔
+
+    def __init__(self, master, startup_profile=None):
         self.master = master
         master.title("自炊本管理ソフト")
+        self.startup_profile = startup_profile or StartupProfile()
         
-        # 'superhero'テーマはモダンで先進的な外観を提供します。
-        try:
-            import ttkbootstrap as ttkb
-            self.style = ttkb.Style(theme="superhero") 
-            try:
-                # ttkbootstrapのダイアログを使用
-                from ttkbootstrap.dialogs import Messagebox
-                self.Messagebox = Messagebox
-            except ImportError:
-                self.Messagebox = None
-        except ImportError:
-            # ttkbootstrapがない場合は標準のttkを使用
-            self.style = ttk.Style()
-            self.Messagebox = None
+        # テーマはcreate_main_window()でウィンドウ作成時に適用済み ('superhero')
+        # (ttkbootstrapのWindowならそのStyleを使い、ない場合は標準のttkを使用)
+        self.style = getattr(master, 'style', None) or ttk.Style(master)
+        self.Messagebox = None # ttkbootstrapのダイアログ (最初に使うときに読み込む)
 
         # 対応する画像拡張子を定義 (webpを含む)
-        self.IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp') 
+        self.IMAGE_EXTENSIONS = IMAGE_EXTENSIONS
         # 対応する書籍ファイル拡張子を定義
-        self.BOOK_EXTENSIONS = ('.zip', '.cbz')
+        self.BOOK_EXTENSIONS = BOOK_EXTENSIONS
 
         # 画面レイアウトの設定
         master.grid_columnconfigure(0, weight=1) # フォルダ/ファイルリスト (左パネル)
@@ -41,7 +1840,26 @@ class BookManagerApp:
         master.grid_rowconfigure(0, weight=1)
 
         self.current_folder = ""
-        self.files = [] # ファイルフルパスのリスト
+        self.files = [] # ファイルフルパスのリスト (表示順)
+        self.file_sort_keys = [] # self.filesと同じ順序のソートキー (二分探索で挿入位置を求めるため)
+        self.file_infos = {} # 表示中の書籍情報 {ファイルパス: make_file_infoの結果}
+        self.file_items = {} # ファイルリストのアイテムID {ファイルパス: TreeviewのアイテムID}
+        self.item_paths = {} # file_itemsの逆引き {TreeviewのアイテムID: ファイルパス}
+        self.file_positions = {} # self.files内の位置 {ファイルパス: インデックス}
+        self.visible_files = self.files # 検索で絞り込んだ表示対象 (絞り込みなしならself.filesそのもの)
+        self.search_index = None # 書籍名の検索インデックス (スキャン完了時に作成、それまでは順に照合)
+        self.positions_valid_until = 0 # file_positionsが正しい範囲 (これより後ろは必要時に再計算)
+        self.folder_watcher = None # 現在のフォルダの変更監視
+        self.thumbnail_dir = THUMBNAIL_DIR # サムネイルのキャッシュフォルダ
+        self.scan_generation = 0 # フォルダ読み込みの世代 (古いバックグラウンド処理の結果を破棄するため)
+        self.scan_cancel_event = threading.Event() # 実行中のフォルダスキャンを中断するためのイベント
+        self.scan_streaming = False # スキャン結果を順次ファイルリストに追加中か
+        self.verify_cancel_event = None # 実行中の整合性チェックを中断するためのイベント (チェックごとに作成)
+        self.status_job = None # ステータス欄に表示中の処理 ('scan' または 'verify'、中止ボタンの対象)
+        self.verify_status_text = "" # 整合性チェックの進捗の表示
+
+        # バックグラウンドスレッドからUIを操作するためのキュー (メインスレッドで定期的に処理)
+        self.ui_queue = queue.Queue()
         self.preview_image = None
         self.original_image = None
         
@@ -49,18 +1867,69 @@ class BookManagerApp:
         self.current_file_path = ""        # 現在開いている本のフルパス
         self.current_book_images = []      # 現在の本の全画像ファイル名リスト
         self.current_page_index = -1       # 現在のページインデックス
-        self.settings_file = "settings.json" # 設定ファイル名
-        self.reading_progress = {}         # 読書進捗 {ファイルパス: ページインデックス}
+        self.current_spread = ()           # 表示中のページインデックス (見開きなら2ページ、読む順)
+        self.page_sizes = {}               # {(ファイルパス, 画像名): 元画像のサイズ} 見開きの判定用 (デコード時に記録)
+        self.settings_file = SETTINGS_FILE # 設定ファイル名
+        self.progress_file = PROGRESS_FILE # 読書進捗ファイル名
+        self.library_db_file = LIBRARY_DB_FILE # ライブラリインデックスのファイル名
+        self.library_index = LibraryIndex(self.library_db_file)
+        self.reading_progress = ProgressStore(       # 読書進捗 {ファイルパス: ページインデックス}
+            self.progress_file, on_flush=self.library_index.set_last_pages
+        )
         self.folder_history = []           # フォルダ履歴リスト
         self.history_max = 10              # 履歴の最大数
         self.settings = {
             'is_animation_enabled': False,  # ページめくりアニメーション (デフォルト: OFF)
             'page_turn_direction': 'L2R',   # 'L2R': 左で次頁, 'R2L': 右で次頁 
+            'spread_mode': False,           # 2ページずつ並べて見開きで表示するか (R2Lでは後のページを左に置く)
+            'spread_single_cover': True,    # 見開き表示で表紙 (先頭ページ) を単独で表示するか
             'sort_key': 'name',             # 現在のソートキー
-            'sort_reverse': False           # 降順 (True) か昇順 (False) か
+            'sort_reverse': False,          # 降順 (True) か昇順 (False) か
+            'prefetch_pages': 3,            # 読書方向に先読みするページ数
+            'prefetch_workers': 2,          # 先読みに使うワーカースレッド数
+            'archive_pool_size': 4,         # 開いたままにしておくアーカイブの数
+            'page_cache_mb': 512,           # ページキャッシュのメモリ上限 (MB)
+            'resize_debounce_ms': 150,      # ウィンドウのサイズ変更が止まってから高品質描画するまでの待ち時間
+            'animation_duration_ms': 250,   # ページめくりアニメーションの長さ
+            'recursive_scan': False,        # サブフォルダ内の書籍も表示するか
+            'watch_interval_sec': 5,        # フォルダの変更を確認する間隔 (0で監視しない)
+            'view_mode': 'list',            # ファイル一覧の表示方法 ('list', 'virtual' または 'grid')
+            'thumbnail_workers': 0,         # サムネイル作成のプロセス数 (0でCPUコア数)
+            'latency_stats': False,         # 処理時間を計測するか (F3のオーバーレイ表示中は常に計測)
+            'verify_workers': 0,            # 整合性チェックのプロセス数 (0でCPUコア数)
+            'verify_io_limit': 4            # 整合性チェックで同時に読み込む書籍の数
         } 
 
-        self.load_settings() # 設定（進捗と履歴）をロード
+        # 処理の段階ごとの所要時間 (無効なときは計測しない)
+        self.latency = LatencyStats()
+        self.latency_overlay_visible = False
+        self.latency_overlay_after_id = None
+
+        self.load_settings() # 設定（履歴とアプリ設定）をロード
+        self.startup_profile.mark("設定の読み込み")
+        self.latency.enabled = self.settings['latency_stats']
+
+        # 現在の本と最近開いた本のZipFileを開いたまま保持する
+        # (エントリ一覧はライブラリインデックスに保存し、次回以降はセントラルディレクトリを解析しない)
+        self.archive_pool = ArchivePool(self.settings['archive_pool_size'], self.library_index)
+
+        # デコード済み画像と表示用リサイズ画像のキャッシュ
+        self.page_cache = PageCache(self.settings['page_cache_mb'])
+        self.current_page_key = None       # 表示中のページのキー (ファイルパス, 画像名)
+
+        # 拡大表示 (倍率に必要な解像度の画像をタイルに分割し、表示範囲のタイルだけを描画する)
+        self.zoom_scale = None             # 原寸に対する表示倍率 (Noneならウィンドウに合わせて表示)
+        self.zoom_pyramid = None           # 表示中のページのTilePyramid
+        self.zoom_generation = 0           # 拡大表示を終えるたびに増やし、古いデコード結果を捨てる
+        self.zoom_request_scale = None     # デコード中の画像の倍率 (デコード中でなければNone)
+        self.zoom_origin = (0, 0)          # 拡大した画像の左上のキャンバス座標
+        self.zoom_tile_items = {}          # {(列, 行): (キャンバスのアイテムID, PhotoImage)} 表示中のタイル
+
+        # ページ先読み (読書方向の次Nページと、逆方向の1ページをバックグラウンドでデコード)
+        self.reading_direction = 'next'
+        self.prefetcher = PagePrefetcher(self.prefetch_page_image, self.settings['prefetch_workers'])
+        # 見開きの2ページ目を並列にデコードするスレッド
+        self.spread_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="spread-decode")
 
         # スクロール/アニメーション状態管理
         self.scroll_start_x = 0
@@ -70,6 +1939,7 @@ class BookManagerApp:
         self.is_dragging = False           # ドラッグ中フラグ
         self.is_animating = False          # アニメーション中フラグ
         self.old_image_item_id = None      # 遷移前の画像ID
+        self.animation_state = None        # ページめくりアニメーションの状態
         self.settings_window = None        # 設定ウィンドウの参照
 
         # ----------------------------------------------------
@@ -133,14 +2003,68 @@ class BookManagerApp:
             self.sort_frame,
             text="降順",
             variable=self.sort_reverse_var,
+            command=self.on_sort_toggle, # 変数が切り替わった後に呼ばれる
             bootstyle="square-toggle"
         )
         self.sort_toggle_button.grid(row=1, column=0, columnspan=2, pady=(5, 5), sticky="ew")
-        self.sort_toggle_button.bind("<ButtonRelease-1>", self.on_sort_toggle)
 
-        # ファイルリストのタイトル (row=5)
-        self.file_list_label = ttk.Label(self.control_frame, text="ファイル一覧:", bootstyle="secondary")
-        self.file_list_label.grid(row=5, column=0, sticky="nw", pady=(5, 0))
+        # サブフォルダを含めるかの切り替え
+        self.recursive_scan_var = tk.BooleanVar(value=self.settings['recursive_scan'])
+        self.recursive_scan_check = ttk.Checkbutton(
+            self.sort_frame,
+            text="サブフォルダも含める",
+            variable=self.recursive_scan_var,
+            command=self.on_recursive_toggle,
+            bootstyle="square-toggle"
+        )
+        self.recursive_scan_check.grid(row=2, column=0, columnspan=2, pady=(0, 5), sticky="ew")
+
+        # スキャン状況の表示 (row=4, スキャン中のみ表示)
+        self.scan_status_frame = ttk.Frame(self.control_frame)
+        self.scan_status_frame.grid(row=4, column=0, pady=(0, 5), sticky="ew")
+        self.scan_status_frame.grid_columnconfigure(0, weight=1)
+        self.scan_status_label = ttk.Label(self.scan_status_frame, text="", bootstyle="secondary")
+        self.scan_status_label.grid(row=0, column=0, sticky="w")
+        self.scan_cancel_button = ttk.Button(
+            self.scan_status_frame,
+            text="✖ 中止",
+            command=self.cancel_status_job,
+            bootstyle="danger-link"
+        )
+        self.scan_cancel_button.grid(row=0, column=1, sticky="e")
+        self.scan_progressbar = ttk.Progressbar(self.scan_status_frame, mode="indeterminate", bootstyle="info-striped")
+        self.scan_progressbar.grid(row=1, column=0, columnspan=2, sticky="ew")
+        self.scan_status_frame.grid_remove()
+
+        # ファイルリストのタイトルと表示切り替え (row=5)
+        self.file_list_header = ttk.Frame(self.control_frame)
+        self.file_list_header.grid(row=5, column=0, pady=(5, 0), sticky="ew")
+        self.file_list_header.grid_columnconfigure(0, weight=1)
+        self.file_list_label = ttk.Label(self.file_list_header, text="ファイル一覧:", bootstyle="secondary")
+        self.file_list_label.grid(row=0, column=0, sticky="nw")
+
+        # 表示方法の切り替え (リスト / 大量向けの仮想化リスト / 表紙グリッド)
+        self.view_mode_labels = {"list": "リスト", "virtual": "リスト (大量向け)", "grid": "🖼️ グリッド"}
+        self.view_mode_combobox = ttk.Combobox(
+            self.file_list_header,
+            values=list(self.view_mode_labels.values()),
+            state="readonly",
+            width=14
+        )
+        self.view_mode_combobox.grid(row=0, column=1, sticky="e")
+        self.view_mode_combobox.set(self.view_mode_labels.get(self.settings['view_mode'], "リスト"))
+        self.view_mode_combobox.bind("<<ComboboxSelected>>", self.on_view_mode_change)
+
+        # 書籍名の絞り込み検索 (入力するたびに絞り込む。Escで解除)
+        self.search_frame = ttk.Frame(self.file_list_header)
+        self.search_frame.grid(row=1, column=0, columnspan=2, pady=(5, 5), sticky="ew")
+        self.search_frame.grid_columnconfigure(1, weight=1)
+        ttk.Label(self.search_frame, text="🔍", bootstyle="secondary").grid(row=0, column=0, padx=(0, 5))
+        self.search_var = tk.StringVar()
+        self.search_entry = ttk.Entry(self.search_frame, textvariable=self.search_var)
+        self.search_entry.grid(row=0, column=1, sticky="ew")
+        self.search_entry.bind('<Escape>', lambda e: self.search_var.set(""))
+        self.search_var.trace_add('write', self.on_search_change)
         
         # Treeviewとそのスクロールバーを保持するフレーム (row=6)
         self.file_list_frame = ttk.Frame(self.control_frame)
@@ -151,7 +2075,7 @@ class BookManagerApp:
         # ファイルリスト（Treeviewを使用）
         self.file_list = ttk.Treeview(
             self.file_list_frame, 
-            columns=('Format', 'Size', 'Date'), 
+            columns=('Format', 'Pages', 'Size', 'Date'), 
             show='tree headings', 
             selectmode='browse',
             height=15
@@ -160,6 +2084,8 @@ class BookManagerApp:
         self.file_list.column('#0', width=150, stretch=tk.YES)
         self.file_list.heading('Format', text='形式')
         self.file_list.column('Format', width=50, stretch=tk.NO)
+        self.file_list.heading('Pages', text='頁数')
+        self.file_list.column('Pages', width=45, stretch=tk.NO, anchor='e')
         self.file_list.heading('Size', text='サイズ')
         self.file_list.column('Size', width=70, stretch=tk.NO, anchor='e')
         self.file_list.heading('Date', text='更新日')
@@ -169,6 +2095,7 @@ class BookManagerApp:
         self.file_list.tag_configure('read', foreground='green')
         self.file_list.tag_configure('reading', foreground='yellow')
         self.file_list.tag_configure('normal', foreground='white')
+        self.file_list.tag_configure('broken', foreground='red')
         
         # スクロールバー
         self.scrollbar = ttk.Scrollbar(self.file_list_frame, orient="vertical", command=self.file_list.yview)
@@ -179,6 +2106,15 @@ class BookManagerApp:
         
         # 選択イベントを設定
         self.file_list.bind('<<TreeviewSelect>>', self.on_file_select)
+
+        # 表紙のグリッド表示 (サムネイルはプロセスプールで作成)
+        workers = self.settings.get('thumbnail_workers') or None
+        self.thumbnail_service = ThumbnailService(self.thumbnail_dir, self.IMAGE_EXTENSIONS, workers)
+        # グリッドと大量の書籍向けの仮想化リストは、初めて切り替えたときに作成する (get_file_view)
+        self.thumbnail_grid = None
+        self.virtual_list = None
+        if self.settings['view_mode'] != 'list':
+            self.set_view_mode(self.settings['view_mode'])
         
         # ----------------------------------------------------
         # 2. プレビューパネル
@@ -205,8 +2141,9 @@ class BookManagerApp:
         )
         self.preview_canvas.grid(row=1, column=0, sticky="nsew")
         
-        # キャンバスのサイズ変更に対応するためのバインディング
-        self.preview_canvas.bind('<Configure>', self.resize_image_preview)
+        # キャンバスのサイズ変更に対応するためのバインディング (連続するイベントはまとめて処理)
+        self.resize_after_id = None
+        self.preview_canvas.bind('<Configure>', self.on_canvas_configure)
         
         # スクロール機能とクリックページめくりのバインディング
         self.preview_canvas.bind("<ButtonPress-1>", self.start_scroll)
@@ -257,14 +2194,55 @@ class BookManagerApp:
         self.prev_button.grid(row=0, column=2, padx=(5, 0), sticky="w")
         
         # キーボードバインディング (一般的な操作を維持)
-        master.bind('<Left>', lambda e: self.prev_page())
-        master.bind('<Right>', lambda e: self.next_page())
+        # (検索欄などの入力欄ではカーソル移動に使うため、ページはめくらない)
+        master.bind('<Left>', lambda e: self.is_text_input(e) or self.prev_page())
+        master.bind('<Right>', lambda e: self.is_text_input(e) or self.next_page())
+        master.bind('<F3>', self.toggle_latency_overlay) # 処理時間のオーバーレイ表示
+
+        # 拡大/縮小 (Ctrl+ホイールはhandle_mouse_wheelで処理、0でウィンドウに合わせる)
+        for sequence in ('<KeyPress-plus>', '<KeyPress-equal>', '<KeyPress-KP_Add>'):
+            master.bind(sequence, lambda e: self.on_zoom_key(e, self.ZOOM_STEP))
+        for sequence in ('<KeyPress-minus>', '<KeyPress-KP_Subtract>'):
+            master.bind(sequence, lambda e: self.on_zoom_key(e, 1 / self.ZOOM_STEP))
+        master.bind('<KeyPress-0>', lambda e: self.on_zoom_key(e, None))
+
+        # 終了時に先読みスレッドを停止する
+        master.protocol("WM_DELETE_WINDOW", self.on_closing)
         
         # 初期ソート状態の適用（昇順/降順ボタンのテキストを設定）
         self.sort_toggle_button.config(text="降順" if self.settings['sort_reverse'] else "昇順")
 
+        self.startup_profile.mark("ウィジェットの作成")
+
         # 初期プレースホルダーの表示
         master.after(100, self.display_placeholder)
+        master.after(self.UI_QUEUE_POLL_MS, self.process_ui_queue)
+        # ウィンドウが画面に表示されてから、後回しにした初期化を行う
+        master.bind('<Map>', self.finish_startup, add='+')
+
+    def finish_startup(self, event):
+        """メインウィンドウが最初に表示されたときに呼ばれ、起動時間を記録して後回しにした初期化を行います。
+
+        <Map>は子ウィジェットでも発生するため、メインウィンドウ自身のイベントだけを扱います。
+        """
+        if event.widget is not self.master:
+            return
+        self.master.unbind('<Map>')
+        self.startup_profile.mark("最初のフレーム")
+        if self.startup_profile.verbose:
+            print(self.startup_profile.report())
+        # 読書進捗は最初の本の表示までにバックグラウンドで読み込んでおく
+        threading.Thread(target=self.reading_progress.ensure_loaded, name="progress-loader", daemon=True).start()
+
+    def get_messagebox(self):
+        """ttkbootstrapのダイアログを返します。(初回に読み込み、ttkbootstrapがない場合はNone)"""
+        if self.Messagebox is None:
+            try:
+                from ttkbootstrap.dialogs import Messagebox
+                self.Messagebox = Messagebox
+            except ImportError:
+                self.Messagebox = False
+        return self.Messagebox or None
 
     # ====================================================
     # ソート機能メソッド
@@ -284,15 +2262,46 @@ class BookManagerApp:
 
         self.save_settings()
         if self.current_folder:
-            self.load_files()
+            self.resort_file_list()
 
     def on_sort_toggle(self, event=None):
-        """昇順/降順が切り替えられたときに設定を更新し、ファイルを再ロードします。"""
+        """昇順/降順が切り替えられたときに設定を更新し、ファイルの並び順を反転します。"""
         # Checkbuttonの変数が既に切り替わっているので、その値を使う
         is_reverse = self.sort_reverse_var.get()
+        if is_reverse == self.settings['sort_reverse']:
+            return
         self.settings['sort_reverse'] = is_reverse
         self.sort_toggle_button.config(text="降順" if is_reverse else "昇順")
 
+        self.save_settings()
+        if self.current_folder:
+            self.resort_file_list(reverse_only=True)
+
+    def resort_file_list(self, reverse_only=False):
+        """ファイルシステムを再スキャンせず、保持している書籍情報だけで並べ替えます。
+
+        ソートキーは書籍情報の作成時に計算済みのものを使い、Treeviewの行も作り直さずに
+        並び順だけを入れ替えます。reverse_only=Trueなら現在の並びを反転するだけです。
+        """
+        if reverse_only:
+            self.files.reverse()
+            self.file_sort_keys.reverse()
+        else:
+            self.files.sort(key=lambda path: self.file_sort_key(self.file_infos[path]), reverse=self.settings['sort_reverse'])
+            self.file_sort_keys = [self.file_sort_key(self.file_infos[path]) for path in self.files]
+
+        self.reset_file_positions()
+
+        if self.is_tree_view():
+            if len(self.file_items) == len(self.files):
+                self.file_list.set_children('', *(self.file_items[path] for path in self.files))
+            else:
+                self.rebuild_tree_rows()
+        self.on_file_list_changed()
+
+    def on_recursive_toggle(self):
+        """サブフォルダを含めるかが切り替えられたときに設定を更新し、ファイルを再ロードします。"""
+        self.settings['recursive_scan'] = self.recursive_scan_var.get()
         self.save_settings()
         if self.current_folder:
             self.load_files()
@@ -302,42 +2311,46 @@ class BookManagerApp:
     # ====================================================
 
     def load_settings(self):
-        """JSONファイルから読書進捗、フォルダ履歴、およびアプリ設定をロードします。"""
+        """JSONファイルからフォルダ履歴、およびアプリ設定をロードします。(読書進捗は最初に必要になったときに読み込む)"""
         if os.path.exists(self.settings_file):
             try:
                 with open(self.settings_file, 'r', encoding='utf-8') as f:
                     data = json.load(f)
-                    self.reading_progress = data.get('progress', {})
                     self.folder_history = data.get('history', [])
                     
                     # 設定をロードし、存在しないキーはデフォルト値を維持
                     loaded_settings = data.get('settings', {})
                     self.settings.update(loaded_settings)
+
+                    # 旧形式 (settings.jsonに進捗を保存していた) からの移行
+                    if 'progress' in data and not os.path.exists(self.progress_file):
+                        self.reading_progress.update(data['progress'])
+                        self.reading_progress.flush()
             except Exception:
-                self.reading_progress = {}
                 self.folder_history = []
         
         if not self.folder_history:
             self.folder_history.append(os.path.expanduser("~")) 
 
+        # 読書進捗はバックグラウンドで定期的に保存する
+        self.reading_progress.start()
+
     def save_settings(self):
-        """現在の進捗、フォルダ履歴、およびアプリ設定をJSONファイルに保存します。"""
+        """フォルダ履歴、およびアプリ設定をJSONファイルに保存します。(読書進捗はProgressStoreが保存)"""
         data = {
-            'progress': self.reading_progress,
             'history': self.folder_history,
             'settings': self.settings
         }
         try:
-            with open(self.settings_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=4)
+            with self.latency.measure('settings.write'):
+                write_json_atomic(self.settings_file, data, indent=4)
         except Exception as e:
             print(f"設定ファイル書き込みエラー: {e}")
             
     def update_progress(self, index):
-        """現在のファイルの読書進捗を更新し、保存します。"""
+        """現在のファイルの読書進捗を更新します。(ファイルへの書き込みはバックグラウンドで行われる)"""
         if self.current_file_path:
             self.reading_progress[self.current_file_path] = index
-            self.save_settings()
 
     def update_folder_history(self, path):
         """フォルダ履歴を更新します。"""
@@ -353,6 +2366,7 @@ class BookManagerApp:
         """フォルダ選択メニューボタンのドロップダウンメニューを更新します。"""
         self.folder_menu.delete(0, tk.END)
         self.folder_menu.add_command(label="新しいフォルダを選択...", command=self.select_new_folder)
+        self.folder_menu.add_command(label="🩺 現在のフォルダの整合性をチェック", command=self.start_verification)
         self.folder_menu.add_separator()
         
         for path in self.folder_history:
@@ -368,6 +2382,7 @@ class BookManagerApp:
         # 初期のディレクトリ設定
         initial_dir = self.current_folder if self.current_folder and os.path.isdir(self.current_folder) else os.path.expanduser("~")
         
+        from tkinter import filedialog
         folder_path = filedialog.askdirectory(initialdir=initial_dir)
         if folder_path:
             self.set_folder(folder_path)
@@ -384,85 +2399,714 @@ class BookManagerApp:
         self.load_files()
 
     def load_files(self):
-        """現在のフォルダからZIP/CBZファイルを読み込み、リストに表示します。"""
-        self.files = []
-        self.file_list.delete(*self.file_list.get_children())
-        
-        file_info = []
+        """現在のフォルダのZIP/CBZファイルをリストに表示します。
+
+        まずライブラリインデックスの内容を即座に表示し、実際のファイルとの照合
+        (サイズ/更新日時が変わったものだけ更新) とページ数の計算はバックグラウンドで行います。
+        インデックスにないフォルダは、スキャン結果を見つかった順に少しずつ表示します。
+        """
+        # 前のフォルダのスキャンや監視、整合性チェックが実行中なら中断する
+        self.stop_folder_watcher()
+        self.cancel_verification()
+        self.scan_cancel_event.set()
+        self.scan_cancel_event = threading.Event()
+        self.scan_generation += 1
+        generation = self.scan_generation
+        folder = self.current_folder
+        recursive = self.settings['recursive_scan']
+        self.search_index = None
 
         try:
-            for item in os.listdir(self.current_folder):
-                # BOOK_EXTENSIONSを使用してZIP/CBZファイルをフィルタリング
-                if item.lower().endswith(self.BOOK_EXTENSIONS): 
-                    file_path = os.path.join(self.current_folder, item)
-                    stat_info = os.stat(file_path)
-                    
-                    # サイズをKB, MB形式にフォーマット
-                    size_bytes = stat_info[stat.ST_SIZE]
-                    if size_bytes > 1024 * 1024:
-                        size_str = f"{size_bytes / (1024 * 1024):.1f} MB"
-                    elif size_bytes > 1024:
-                        size_str = f"{size_bytes / 1024:.0f} KB"
-                    else:
-                        size_str = f"{size_bytes} B"
-                        
-                    # 最終更新日時
-                    date_mod = stat_info[stat.ST_MTIME]
-                    
-                    file_info.append({
-                        'path': file_path,
-                        'name': item,
-                        'size_bytes': size_bytes,
-                        'size_str': size_str,
-                        'date_mod': date_mod,
-                        'date_str': self.format_date(date_mod)
-                    })
-            
-            if not file_info:
-                self.display_text_message("フォルダ内にZIP/CBZファイルが見つかりません。")
+            with self.latency.measure('scan.index_load'):
+                records = self.library_index.get_folder(folder, recursive)
+        except Exception as e:
+            print(f"ライブラリインデックス読み込みエラー: {e}")
+            records = []
+
+        with self.latency.measure('scan.populate'):
+            if records:
+                self.populate_file_list(records)
+            else:
+                # 初めて開くフォルダはスキャン結果を順次追加する
+                self.clear_file_list()
+        self.scan_streaming = not records
+
+        self.show_scan_status("スキャン中...")
+        threading.Thread(
+            target=self.reconcile_folder,
+            args=(folder, generation, recursive, self.scan_cancel_event),
+            name="library-scan",
+            daemon=True
+        ).start()
+
+    def reconcile_folder(self, folder, generation, recursive, cancel_event):
+        """フォルダをスキャンしてインデックスと照合します。(バックグラウンドスレッド)"""
+        try:
+            scanned = []
+            batch = []
+            walk_start = time.perf_counter()
+            for record in iter_book_files(folder, self.BOOK_EXTENSIONS, recursive, cancel_event):
+                scanned.append(record)
+                batch.append(record)
+                if len(batch) >= self.SCAN_BATCH:
+                    self.post_to_ui(self.on_scan_batch, generation, batch, len(scanned))
+                    batch = []
+            if cancel_event.is_set():
+                # 途中までのスキャン結果で照合すると未スキャンの書籍が削除されるため、ここで終了
                 return
-            
-            # ソート処理
-            sort_key = self.settings['sort_key']
-            reverse = self.settings['sort_reverse']
-            
-            if sort_key == 'name':
-                # 拡張子を除いたファイル名でソート
-                file_info.sort(key=lambda x: os.path.splitext(x['name'])[0].lower(), reverse=reverse)
-            elif sort_key == 'size':
-                file_info.sort(key=lambda x: x['size_bytes'], reverse=reverse)
-            elif sort_key == 'date':
-                file_info.sort(key=lambda x: x['date_mod'], reverse=reverse)
-
-            # Treeviewに挿入
-            for info in file_info:
-                self.files.append(info['path'])
-                
-                # 進捗に基づいてタグを設定
-                file_path = info['path']
-                tag = 'normal'
-                if file_path in self.reading_progress:
-                    if self.reading_progress[file_path] > 0:
-                        tag = 'reading'
-
-                self.file_list.insert(
-                    '', 
-                    'end', 
-                    text=info['name'], 
-                    values=('ZIP/CBZ', info['size_str'], info['date_str']), 
-                    tags=(tag,)
+            if batch:
+                self.post_to_ui(self.on_scan_batch, generation, batch, len(scanned))
+            if self.latency.enabled:
+                self.latency.record('scan.walk', time.perf_counter() - walk_start)
+
+            with self.latency.measure('scan.reconcile'):
+                changed, removed = self.library_index.reconcile(folder, scanned, recursive)
+            records = self.library_index.get_folder(folder, recursive)
+            self.post_to_ui(self.on_folder_reconciled, generation, records, bool(changed or removed))
+            # 検索インデックスもこのスレッドで作っておき、完成したものをUI側で差し替える
+            search_index = SearchIndex()
+            for record in records:
+                search_index.add(record['path'], os.path.relpath(record['path'], folder))
+            self.post_to_ui(self.on_search_index_ready, generation, search_index)
+            # 以降の変更は監視で差分として反映する (今回のスキャン結果を比較の基準にする)
+            self.post_to_ui(self.start_folder_watcher, generation, folder, recursive, scanned)
+
+            # ページ数が不明な書籍 (新規/変更) のみアーカイブを開いて数え、まとまった単位で反映する
+            missing = [record['path'] for record in records if record['page_count'] is None]
+            page_counts = {}
+            for done, file_path in enumerate(missing, 1):
+                if cancel_event.is_set():
+                    break
+                try:
+                    with self.latency.measure('scan.page_count'):
+                        page_counts[file_path] = count_archive_pages(file_path, self.IMAGE_EXTENSIONS)
+                except Exception as e:
+                    print(f"ページ数取得エラー: {file_path}: {e}")
+                if len(page_counts) >= self.PAGE_COUNT_BATCH or done == len(missing):
+                    self.library_index.set_page_counts(page_counts)
+                    self.post_to_ui(self.on_page_counts_ready, generation, page_counts)
+                    self.post_to_ui(self.show_scan_status, f"ページ数を計算中... {done} / {len(missing)}", generation)
+                    page_counts = {}
+            if page_counts:
+                self.library_index.set_page_counts(page_counts)
+                self.post_to_ui(self.on_page_counts_ready, generation, page_counts)
+        except Exception as e:
+            self.post_to_ui(self.on_folder_scan_error, generation, e)
+        finally:
+            self.post_to_ui(self.hide_scan_status, generation)
+
+    def start_folder_watcher(self, generation, folder, recursive, baseline):
+        """フォルダの変更監視を開始します。"""
+        interval = self.settings.get('watch_interval_sec', 5)
+        if generation != self.scan_generation or not interval:
+            return
+        self.stop_folder_watcher()
+        self.folder_watcher = FolderWatcher(
+            folder, self.BOOK_EXTENSIONS, recursive, interval,
+            lambda events: self.on_folder_events(generation, events),
+            baseline
+        )
+        self.folder_watcher.start()
+
+    def stop_folder_watcher(self):
+        """フォルダの変更監視を停止します。"""
+        if self.folder_watcher:
+            self.folder_watcher.stop()
+            self.folder_watcher = None
+
+    def on_folder_events(self, generation, events):
+        """監視で検出した変更をインデックスに反映します。(監視スレッド)"""
+        upserts = []
+        removed = []
+        for kind, record in events:
+            if kind == 'removed':
+                removed.append(record['path'])
+                continue
+            try:
+                record['page_count'] = count_archive_pages(record['path'], self.IMAGE_EXTENSIONS)
+            except Exception as e:
+                record['page_count'] = None
+                print(f"ページ数取得エラー: {record['path']}: {e}")
+            upserts.append(record)
+        self.library_index.upsert_books(upserts)
+        self.library_index.remove_books(removed)
+        self.post_to_ui(self.apply_folder_events, generation, events)
+
+    def apply_folder_events(self, generation, events):
+        """変更のあった書籍だけをファイルリストの正しいソート位置に追加/削除します。"""
+        if generation != self.scan_generation:
+            return
+        for kind, record in events:
+            if kind in ('removed', 'modified'):
+                self.remove_file_row(record['path'])
+            if kind in ('added', 'modified'):
+                self.add_file_row(record)
+        self.on_file_list_changed()
+
+    def add_file_row(self, record):
+        """書籍をソート順を保ったまま追加します。(挿入位置は二分探索で求める)"""
+        info = self.make_file_info(record)
+        key = self.file_sort_key(info)
+        position = find_sorted_position(self.file_sort_keys, key, self.settings['sort_reverse'])
+        self.files.insert(position, info['path'])
+        self.invalidate_file_positions(position)
+        self.file_sort_keys.insert(position, key)
+        self.file_infos[info['path']] = info
+        if self.search_index is not None:
+            self.search_index.add(info['path'], info['name'])
+        self.insert_file_row(position, info)
+
+    def remove_file_row(self, file_path):
+        """書籍をファイルリストから削除します。"""
+        position = self.find_file_position(file_path)
+        if position is None:
+            return
+        del self.files[position]
+        self.file_positions.pop(file_path, None)
+        self.invalidate_file_positions(position)
+        del self.file_sort_keys[position]
+        del self.file_infos[file_path]
+        if self.search_index is not None:
+            self.search_index.remove(file_path)
+        item_id = self.file_items.pop(file_path, None)
+        if item_id:
+            del self.item_paths[item_id]
+            self.file_list.delete(item_id)
+
+    def find_file_position(self, file_path):
+        """ソートキーの二分探索で、書籍のself.files内の位置を返します。"""
+        info = self.file_infos.get(file_path)
+        if info is None:
+            return None
+        key = self.file_sort_key(info)
+        position = find_sorted_position(self.file_sort_keys, key, self.settings['sort_reverse'], after_equal=False)
+        # 同じキーの書籍が複数ある場合はその範囲内を探す
+        while position < len(self.files) and self.file_sort_keys[position] == key:
+            if self.files[position] == file_path:
+                return position
+            position += 1
+        return None
+
+    def on_scan_batch(self, generation, records, scanned_count):
+        """スキャン途中の結果をファイルリストの末尾に追加します。(ソートはスキャン完了時に行う)"""
+        if generation != self.scan_generation:
+            return
+        self.show_scan_status(f"スキャン中... {scanned_count} 件")
+        if not self.scan_streaming:
+            return
+        for record in records:
+            info = self.make_file_info(record)
+            self.files.append(info['path'])
+            self.file_infos[info['path']] = info
+            self.insert_file_row('end', info)
+        self.on_file_list_changed()
+
+    def on_folder_reconciled(self, generation, records, changed):
+        """バックグラウンドでの照合結果をファイルリストに反映します。"""
+        if generation != self.scan_generation:
+            return
+        if changed or self.scan_streaming or not self.files:
+            self.populate_file_list(records)
+        self.scan_streaming = False
+
+    def show_scan_status(self, text, generation=None, job='scan'):
+        """スキャン (job='verify'なら整合性チェック) の状況の表示を更新します。"""
+        if generation is not None and generation != self.scan_generation:
+            return
+        self.status_job = job
+        self.scan_status_label.config(text=text)
+        if not self.scan_status_frame.winfo_ismapped():
+            self.scan_status_frame.grid()
+            self.scan_progressbar.start(15)
+
+    def hide_scan_status(self, generation=None, job='scan'):
+        """状況の表示を隠します。(別の処理の状況を表示中なら何もしない)"""
+        if generation is not None and generation != self.scan_generation:
+            return
+        if self.status_job != job:
+            return
+        self.status_job = None
+        self.scan_progressbar.stop()
+        self.scan_status_frame.grid_remove()
+
+    def on_view_mode_change(self, event=None):
+        """ファイル一覧の表示方法が変更されたときに設定を更新し、表示を切り替えます。"""
+        selected_text = self.view_mode_combobox.get()
+        new_mode = next((mode for mode, label in self.view_mode_labels.items() if label == selected_text), 'list')
+        self.settings['view_mode'] = new_mode
+        self.save_settings()
+        self.set_view_mode(new_mode)
+
+    def set_view_mode(self, mode):
+        """ファイル一覧の表示方法を切り替えます。
+
+        Treeviewは書籍ごとに行を作るため、リスト表示以外のときは行を作らずに空にしておきます。
+        """
+        for view in (self.thumbnail_grid, self.virtual_list):
+            if view is not None:
+                view.hide()
+        if mode == 'list':
+            self.rebuild_tree_rows()
+            self.file_list.grid()
+            self.scrollbar.grid()
+            return
+
+        self.file_list.grid_remove()
+        self.scrollbar.grid_remove()
+        self.file_list.delete(*self.file_list.get_children())
+        self.file_items = {}
+        self.item_paths = {}
+        self.get_file_view(mode).show()
+
+    def get_file_view(self, mode):
+        """グリッド ('grid') または仮想化リストを返します。(起動を速くするため、初回に作成)"""
+        if mode == 'grid':
+            if self.thumbnail_grid is None:
+                self.thumbnail_grid = ThumbnailGrid(self.file_list_frame, self)
+            return self.thumbnail_grid
+        if self.virtual_list is None:
+            self.virtual_list = VirtualFileList(self.file_list_frame, self)
+        return self.virtual_list
+
+    def visible_file_view(self):
+        """表示中のグリッド/仮想化リストを返します。(Treeview表示のときはNone)"""
+        for view in (self.thumbnail_grid, self.virtual_list):
+            if view is not None and view.is_visible():
+                return view
+        return None
+
+    def is_tree_view(self):
+        """ファイル一覧をTreeviewで表示しているか返します。"""
+        return self.settings['view_mode'] == 'list'
+
+    def rebuild_tree_rows(self):
+        """現在の書籍一覧からTreeviewの行を作り直します。"""
+        self.file_list.delete(*self.file_list.get_children())
+        self.file_items = {}
+        self.item_paths = {}
+        for file_path in self.files:
+            self.insert_file_row('end', self.file_infos[file_path])
+        if self.visible_files is not self.files:
+            self.file_list.set_children('', *(self.file_items[path] for path in self.visible_files))
+
+    def on_search_index_ready(self, generation, search_index):
+        """バックグラウンドで作成した検索インデックスに差し替えます。"""
+        if generation != self.scan_generation:
+            return
+        self.search_index = search_index
+        if self.visible_files is not self.files:
+            self.on_file_list_changed()
+
+    def on_search_change(self, *args):
+        """検索語が入力されるたびに表示を絞り込みます。"""
+        self.apply_search_filter(incremental=True)
+        if self.virtual_list is not None:
+            self.virtual_list.reset()
+        self.refresh_file_views()
+
+    def search_matches(self, query):
+        """検索語に一致する書籍のファイルパスの集合を返します。"""
+        if self.search_index is not None:
+            matches = self.search_index.search(query)
+            return {path for path in matches if path in self.file_infos}
+        # インデックスの作成前 (初回スキャン中など) は、表示中の書籍名を順に照合する
+        query, prefix_only = parse_search_query(query)
+        return {
+            path for path, info in self.file_infos.items()
+            if matches_search_text(normalize_search_text(info['name']), query, prefix_only)
+        }
+
+    def apply_search_filter(self, incremental=False):
+        """検索語に一致する書籍だけをself.visible_filesに、ソート順のまま並べます。
+
+        Treeviewの行は作り直さず、一致しない行を切り離す (detach) だけにします。
+        incremental=Trueで前回の結果がさらに絞り込まれた場合 (検索語を入力し続けたとき) は、
+        外れた行だけを切り離します。
+        """
+        previous = self.visible_files
+        query = self.search_var.get()
+        if not parse_search_query(query)[0]:
+            self.visible_files = self.files
+        else:
+            matches = self.search_matches(query)
+            if len(matches) * 4 < len(self.files):
+                # 一致が少なければ、一覧全体を走査せずに一致したものだけを位置順に並べる
+                self.visible_files = sorted(matches, key=self.get_file_position)
+            else:
+                self.visible_files = [path for path in self.files if path in matches]
+
+        if not self.is_tree_view() or previous is self.visible_files:
+            return
+        visible = set(self.visible_files)
+        if incremental and visible.issubset(previous):
+            hidden = [self.file_items[path] for path in previous if path not in visible and path in self.file_items]
+            if hidden:
+                self.file_list.detach(*hidden)
+        else:
+            self.file_list.set_children('', *(self.file_items[path] for path in self.visible_files if path in self.file_items))
+
+    def on_file_list_changed(self):
+        """ファイル一覧の内容が変わったときに、検索の絞り込みとグリッド/仮想化リストの表示を更新します。"""
+        self.apply_search_filter()
+        self.refresh_file_views()
+
+    def refresh_file_views(self):
+        """グリッド/仮想化リストの表示を、表示対象の書籍に合わせて更新します。"""
+        view = self.visible_file_view()
+        if view is None:
+            return
+        if view is self.thumbnail_grid:
+            view.refresh()
+        else:
+            view.render()
+
+    def refresh_visible_rows(self):
+        """グリッド/仮想化リストの表示範囲だけを描き直します。(進捗の色などを反映)"""
+        view = self.visible_file_view()
+        if view is None:
+            return
+        if view is self.thumbnail_grid:
+            view.draw_visible()
+        else:
+            view.render()
+
+    def request_thumbnails(self, file_paths):
+        """グリッドの表示範囲にある書籍のサムネイルを読み込み、なければ作成を要求します。
+
+        作成済みのサムネイルはここでまとめて読み込むだけで、描画は呼び出し元 (draw_visible) が行います。
+        """
+        # スクロールで表示範囲外になった書籍の、未着手の作成要求は取り消す
+        self.thumbnail_service.retain(file_paths)
+        for file_path in file_paths:
+            info = self.file_infos.get(file_path)
+            if info is None or file_path in self.thumbnail_grid.photos:
+                continue
+            cache_path = self.thumbnail_service.cached_path(file_path, info['size_bytes'], info['date_mod'])
+            if cache_path:
+                photo = self.load_thumbnail_photo(cache_path)
+                if photo is not None:
+                    self.thumbnail_grid.set_thumbnail(file_path, photo, redraw=False)
+            else:
+                self.thumbnail_service.request(
+                    file_path, info['size_bytes'], info['date_mod'],
+                    lambda path, result: self.post_to_ui(self.on_thumbnail_ready, path, result)
                 )
 
+    def on_thumbnail_ready(self, file_path, cache_path):
+        """作成されたサムネイルをグリッドに表示します。"""
+        if not cache_path or self.thumbnail_grid is None:
+            return
+        photo = self.load_thumbnail_photo(cache_path)
+        if photo is not None:
+            self.thumbnail_grid.set_thumbnail(file_path, photo)
+
+    def load_thumbnail_photo(self, cache_path):
+        """キャッシュのサムネイル画像をPhotoImageとして読み込みます。読めなければNoneを返します。"""
+        import_pillow()
+        try:
+            with Image.open(cache_path) as img:
+                return ImageTk.PhotoImage(img)
+        except Exception as e:
+            print(f"サムネイル読み込みエラー: {cache_path}: {e}")
+            return None
+
+    def start_verification(self):
+        """現在のフォルダの書籍の整合性チェックをバックグラウンドで開始します。
+
+        前回のチェック以降にサイズ/更新日時が変わっていない書籍は、記録済みの結果を使い再チェックしません。
+        """
+        if not self.current_folder:
+            return
+        if self.verify_cancel_event is not None:
+            # 実行中のチェックがあれば二重に開始せず、その進捗を表示するだけにする
+            text = "整合性チェックを中止しています..." if self.verify_cancel_event.is_set() else self.verify_status_text
+            self.show_scan_status(text, job='verify')
+            return
+        try:
+            records = self.library_index.get_folder(self.current_folder, self.settings['recursive_scan'])
+        except Exception as e:
+            print(f"ライブラリインデックス読み込みエラー: {e}")
+            return
+        pending = [record for record in records if record['integrity'] is None]
+        if not pending:
+            self.show_verification_summary(0, sum(1 for record in records if record['integrity'] == 'broken'))
+            return
+
+        self.verify_cancel_event = threading.Event()
+        self.verify_status_text = f"整合性をチェック中... 0 / {len(pending)}"
+        self.show_scan_status(self.verify_status_text, job='verify')
+        threading.Thread(
+            target=self.verify_books,
+            args=(pending, self.scan_generation, self.verify_cancel_event),
+            name="archive-verify",
+            daemon=True
+        ).start()
+
+    def verify_books(self, records, generation, cancel_event):
+        """書籍の整合性チェックを行い、結果をインデックスとファイルリストに反映します。(バックグラウンドスレッド)"""
+        total = len(records)
+        done = 0
+        results = []
+        try:
+            for result in iter_verification_results(
+                records, self.IMAGE_EXTENSIONS,
+                workers=self.settings.get('verify_workers') or None,
+                max_in_flight=self.settings.get('verify_io_limit', 4),
+                cancel_event=cancel_event
+            ):
+                done += 1
+                results.append(result)
+                if result['status'] == 'broken':
+                    print(f"破損した書籍: {result['path']}: {result['error']}")
+                if len(results) >= 20 or done == total:
+                    self.library_index.set_verifications(results)
+                    self.post_to_ui(self.on_verification_results, generation, results, done, total)
+                    results = []
+            if results:
+                self.library_index.set_verifications(results)
+                self.post_to_ui(self.on_verification_results, generation, results, done, total)
         except Exception as e:
-            self.display_text_message(f"ファイル読み込みエラー: {e}")
+            print(f"整合性チェックエラー: {e}")
+        finally:
+            self.post_to_ui(self.on_verification_finished, generation, done, total)
+
+    def on_verification_results(self, generation, results, done, total):
+        """整合性チェックの結果をファイルリストに反映します。(破損した本は赤で表示)"""
+        if generation != self.scan_generation:
+            return
+        for result in results:
+            info = self.file_infos.get(result['path'])
+            if info is None:
+                continue
+            info['integrity'] = result['status']
+            item_id = self.file_items.get(result['path'])
+            if item_id:
+                self.file_list.item(item_id, tags=(self.get_progress_tag(result['path'], info['page_count']),))
+        self.refresh_visible_rows()
+        self.verify_status_text = f"整合性をチェック中... {done} / {total}"
+        if self.verify_cancel_event is not None and not self.verify_cancel_event.is_set():
+            self.show_scan_status(self.verify_status_text, generation, job='verify')
+
+    def on_verification_finished(self, generation, done, total):
+        """整合性チェックの終了時に、結果の概要を表示します。"""
+        # 別のフォルダに移った後でも、次のチェックを開始できるように状態は戻す
+        self.verify_cancel_event = None
+        self.hide_scan_status(job='verify')
+        if generation != self.scan_generation:
+            return
+        broken = sum(1 for info in self.file_infos.values() if info.get('integrity') == 'broken')
+        self.show_verification_summary(done, broken, cancelled=done < total)
+
+    def show_verification_summary(self, checked, broken, cancelled=False):
+        """整合性チェックの結果の概要をダイアログ (ない場合はコンソール) に表示します。"""
+        message = f"{checked} 冊をチェックしました。" if checked else "変更された書籍はありません。"
+        if cancelled:
+            message += " (中止しました)"
+        message += f"\n破損している書籍: {broken} 冊" if broken else "\n破損している書籍はありません。"
+        messagebox = self.get_messagebox()
+        if messagebox:
+            messagebox.show_info(message, title="整合性チェック")
+        else:
+            print(message)
+
+    def cancel_status_job(self):
+        """ステータス欄に表示中の処理 (フォルダスキャンまたは整合性チェック) だけを中断します。"""
+        if self.status_job == 'verify':
+            self.cancel_verification()
+        else:
+            self.cancel_scan()
+
+    def cancel_scan(self):
+        """実行中のフォルダスキャンを中断します。(表示済みのリストはそのまま残す)"""
+        self.scan_cancel_event.set()
+        self.scan_streaming = False
+        self.hide_scan_status()
+
+    def cancel_verification(self):
+        """実行中の整合性チェックを中断します。(チェック済みの結果は保存済み)"""
+        if self.verify_cancel_event is None:
+            return
+        self.verify_cancel_event.set()
+        self.hide_scan_status(job='verify')
+
+    def on_page_counts_ready(self, generation, page_counts):
+        """計算されたページ数をファイルリストの該当行に反映します。"""
+        if generation != self.scan_generation:
+            return
+        for file_path, page_count in page_counts.items():
+            info = self.file_infos.get(file_path)
+            if info is not None:
+                info['page_count'] = page_count
+            item_id = self.file_items.get(file_path)
+            if item_id:
+                self.file_list.set(item_id, 'Pages', page_count)
+                self.file_list.item(item_id, tags=(self.get_progress_tag(file_path, page_count),))
+        self.refresh_visible_rows()
+
+    def on_folder_scan_error(self, generation, error):
+        """バックグラウンドでのスキャンエラーを表示します。"""
+        if generation == self.scan_generation:
+            self.display_text_message(f"ファイル読み込みエラー: {error}")
+
+    def populate_file_list(self, records):
+        """書籍レコードをソートしてファイルリストに表示します。"""
+        self.clear_file_list()
+        
+        if not records:
+            self.display_text_message("フォルダ内にZIP/CBZファイルが見つかりません。")
+            return
+
+        file_info = [self.make_file_info(record) for record in records]
+            
+        # ソート処理
+        file_info.sort(key=self.file_sort_key, reverse=self.settings['sort_reverse'])
+
+        # Treeviewに挿入
+        for info in file_info:
+            self.files.append(info['path'])
+            self.file_sort_keys.append(self.file_sort_key(info))
+            self.file_infos[info['path']] = info
+            self.insert_file_row('end', info)
+        self.on_file_list_changed()
+
+    def clear_file_list(self):
+        """ファイルリストとその管理情報を空にします。"""
+        self.files = []
+        self.file_sort_keys = []
+        self.file_infos = {}
+        self.file_items = {}
+        self.item_paths = {}
+        self.reset_file_positions()
+        self.file_list.delete(*self.file_list.get_children())
+        if self.virtual_list is not None:
+            self.virtual_list.reset()
+        self.on_file_list_changed()
+
+    def file_sort_key(self, info):
+        """現在のソート設定に対応するソートキーを返します。(名前の自然順のキーはmake_file_infoで計算済み)"""
+        sort_key = self.settings['sort_key']
+        if sort_key == 'date':
+            return info['date_mod']
+        if sort_key == 'size':
+            return info['size_bytes']
+        return info['name_key']
+
+    def insert_file_row(self, position, info):
+        """ファイルリスト (Treeview) に1行挿入し、そのアイテムIDを返します。(リスト表示以外では何もしない)"""
+        if not self.is_tree_view():
+            return None
+        item_id = self.file_items[info['path']] = self.file_list.insert(
+            '', 
+            position, 
+            text=info['name'], 
+            values=('ZIP/CBZ', *self.get_display_values(info)), 
+            tags=(self.get_progress_tag(info['path'], info['page_count']),)
+        )
+        self.item_paths[item_id] = info['path']
+        return item_id
+
+    def get_file_position(self, file_path):
+        """書籍のself.files内の位置を返します。リストにない場合はNoneを返します。
+
+        挿入/削除で位置がずれた範囲だけを、必要になったときにまとめて再計算します。
+        (ページめくりや本の移動では一覧は変わらないため、通常は辞書を引くだけ)
+        """
+        position = self.file_positions.get(file_path)
+        if position is not None and position < self.positions_valid_until:
+            return position
+        for index in range(self.positions_valid_until, len(self.files)):
+            self.file_positions[self.files[index]] = index
+        self.positions_valid_until = len(self.files)
+        return self.file_positions.get(file_path)
+
+    def invalidate_file_positions(self, position):
+        """指定位置以降のfile_positionsを再計算対象にします。"""
+        self.positions_valid_until = min(self.positions_valid_until, position)
+
+    def reset_file_positions(self):
+        """file_positionsを全て再計算対象にします。(並べ替え/一覧の作り直し時)"""
+        self.file_positions = {}
+        self.positions_valid_until = 0
+
+    def make_file_info(self, record):
+        """インデックスのレコードから、ファイルリスト表示用の情報を作成します。
+
+        書籍の数だけ保持するため、表示用の文字列 (サイズ/日時/ページ数) は持たず、
+        描画する行の分だけ get_display_values で作成します。
+        """
+        # サブフォルダ内の書籍は、選択中のフォルダからの相対パスで表示する
+        name = os.path.relpath(record['path'], self.current_folder)
+        return {
+            'path': record['path'],
+            'name': name,
+            'size_bytes': record['size_bytes'],
+            'date_mod': record['date_mod'], # 最終更新日時
+            'page_count': record.get('page_count'),
+            'integrity': record.get('integrity'), # 整合性チェックの結果 ('ok'/'broken'、未検証ならNone)
+            # ソート変更時に再計算しないよう、自然順のキーを先に求めておく (拡張子を除いたファイル名)
+            'name_key': natural_sort_key(os.path.splitext(name)[0]),
+        }
+
+    def get_display_values(self, info):
+        """ファイルリストに表示する (ページ数, サイズ, 更新日時) の文字列を返します。"""
+        page_count = info['page_count']
+        pages_str = str(page_count) if page_count is not None else ''
+        return pages_str, self.format_size(info['size_bytes']), self.format_date(info['date_mod'])
+
+    def get_progress_tag(self, file_path, page_count=None):
+        """読書進捗に基づいてファイルリストのタグを返します。(整合性チェックで破損が見つかった本は'broken')"""
+        if self.is_broken(file_path):
+            return 'broken'
+        index = self.reading_progress.get(file_path, 0)
+        if page_count and index >= page_count - 1 and index > 0:
+            return 'read' # 読了
+        if index > 0:
+            return 'reading' # 読書中
+        return 'normal'
+
+    def get_progress_color(self, file_path):
+        """グリッド表示で使う、読書進捗に応じた文字色を返します。"""
+        info = self.file_infos.get(file_path)
+        tag = self.get_progress_tag(file_path, info['page_count'] if info else None)
+        return {'read': 'green', 'reading': 'yellow', 'broken': 'red'}.get(tag, 'white')
+
+    def is_broken(self, file_path):
+        """整合性チェックで破損が見つかった本か返します。"""
+        info = self.file_infos.get(file_path)
+        return info is not None and info.get('integrity') == 'broken'
+
+    def post_to_ui(self, func, *args):
+        """バックグラウンドスレッドから、メインスレッドで実行する処理を登録します。"""
+        self.ui_queue.put((func, args))
+
+    def process_ui_queue(self):
+        """バックグラウンドスレッドから登録された処理をメインスレッドで実行します。"""
+        try:
+            while True:
+                func, args = self.ui_queue.get_nowait()
+                try:
+                    func(*args)
+                except Exception as e:
+                    print(f"UI更新エラー: {e}")
+        except queue.Empty:
+            pass
+        self.master.after(self.UI_QUEUE_POLL_MS, self.process_ui_queue)
+
+    def format_size(self, size_bytes):
+        """ファイルサイズをB/KB/MB形式にフォーマットします。"""
+        if size_bytes > 1024 * 1024:
+            return f"{size_bytes / (1024 * 1024):.1f} MB"
+        if size_bytes > 1024:
+            return f"{size_bytes / 1024:.0f} KB"
+        return f"{size_bytes} B"
 
     def format_date(self, timestamp):
         """タイムスタンプをYYYY/MM/DD hh:mm形式にフォーマットします。"""
-        import datetime
         return datetime.datetime.fromtimestamp(timestamp).strftime("%Y/%m/%d %H:%M")
 
     def display_text_message(self, message):
         """プレビューキャンバスにテキストメッセージを表示します。"""
+        self.reset_zoom()
         self.preview_canvas.delete("all")
         canvas_width = self.preview_canvas.winfo_width()
         canvas_height = self.preview_canvas.winfo_height()
@@ -543,6 +3187,75 @@ class BookManagerApp:
             bootstyle="info"
         ).pack(anchor='w', pady=2)
 
+        # 見開き表示
+        self.spread_mode_var = tk.BooleanVar(value=self.settings.get('spread_mode', False))
+        ttk.Checkbutton(
+            frame,
+            text="見開きで表示する (右→左の設定では後のページを左に表示)",
+            variable=self.spread_mode_var,
+            bootstyle="primary-round-toggle"
+        ).pack(anchor='w', pady=(10, 2))
+
+        self.spread_single_cover_var = tk.BooleanVar(value=self.settings.get('spread_single_cover', True))
+        ttk.Checkbutton(
+            frame,
+            text="表紙は単独で表示する",
+            variable=self.spread_single_cover_var,
+            bootstyle="primary-round-toggle"
+        ).pack(anchor='w', pady=2)
+
+        # 3. 先読み設定
+        ttk.Separator(frame, bootstyle="secondary").pack(fill='x', pady=10)
+        ttk.Label(frame, text="ページ先読み", font=('Helvetica', 12, 'bold')).pack(anchor='w', pady=(10, 5))
+
+        prefetch_frame = ttk.Frame(frame)
+        prefetch_frame.pack(anchor='w', fill='x')
+
+        ttk.Label(prefetch_frame, text="先読みページ数:").grid(row=0, column=0, sticky='w', pady=2)
+        self.prefetch_pages_var = tk.IntVar(value=self.settings.get('prefetch_pages', 3))
+        ttk.Spinbox(prefetch_frame, from_=0, to=20, width=5, textvariable=self.prefetch_pages_var).grid(row=0, column=1, sticky='w', padx=(10, 0), pady=2)
+
+        ttk.Label(prefetch_frame, text="ワーカースレッド数:").grid(row=1, column=0, sticky='w', pady=2)
+        self.prefetch_workers_var = tk.IntVar(value=self.settings.get('prefetch_workers', 2))
+        ttk.Spinbox(prefetch_frame, from_=1, to=8, width=5, textvariable=self.prefetch_workers_var).grid(row=1, column=1, sticky='w', padx=(10, 0), pady=2)
+
+        ttk.Label(prefetch_frame, text="キャッシュ上限 (MB):").grid(row=2, column=0, sticky='w', pady=2)
+        self.page_cache_mb_var = tk.IntVar(value=self.settings.get('page_cache_mb', 512))
+        ttk.Spinbox(prefetch_frame, from_=64, to=8192, increment=64, width=6, textvariable=self.page_cache_mb_var).grid(row=2, column=1, sticky='w', padx=(10, 0), pady=2)
+
+        # キャッシュの統計情報
+        stats = self.page_cache.get_stats()
+        ttk.Label(
+            prefetch_frame,
+            text=(f"キャッシュ: デコード ヒット {stats['decoded']['hits']} / ミス {stats['decoded']['misses']}, "
+                  f"表示用 ヒット {stats['resized']['hits']} / ミス {stats['resized']['misses']} "
+                  f"({stats['total_mb']:.0f} / {stats['budget_mb']:.0f} MB)"),
+            bootstyle="secondary"
+        ).grid(row=3, column=0, columnspan=2, sticky='w', pady=(5, 0))
+
+        # 4. 処理時間の計測
+        ttk.Separator(frame, bootstyle="secondary").pack(fill='x', pady=10)
+        ttk.Label(frame, text="処理時間の計測", font=('Helvetica', 12, 'bold')).pack(anchor='w', pady=(10, 5))
+
+        self.latency_stats_var = tk.BooleanVar(value=self.settings.get('latency_stats', False))
+        ttk.Checkbutton(
+            frame,
+            text="処理時間を計測する (F3でプレビューに表示)",
+            variable=self.latency_stats_var,
+            bootstyle="primary-round-toggle"
+        ).pack(anchor='w', pady=(5, 5))
+
+        latency_frame = ttk.Frame(frame)
+        latency_frame.pack(anchor='w', fill='x')
+        ttk.Button(
+            latency_frame, text="JSONで書き出す", command=lambda: self.export_latency_stats('.json'), bootstyle="secondary-outline"
+        ).grid(row=0, column=0, padx=(0, 5))
+        ttk.Button(
+            latency_frame, text="CSVで書き出す", command=lambda: self.export_latency_stats('.csv'), bootstyle="secondary-outline"
+        ).grid(row=0, column=1, padx=(0, 5))
+        ttk.Button(
+            latency_frame, text="リセット", command=self.latency.clear, bootstyle="secondary-link"
+        ).grid(row=0, column=2)
 
         # 保存ボタン
         save_button = ttk.Button(
@@ -558,8 +3271,21 @@ class BookManagerApp:
     def close_settings_window(self):
         """設定を保存し、設定画面を閉じます。"""
         # 設定を更新
+        layout = (self.settings['page_turn_direction'], self.settings['spread_mode'], self.settings['spread_single_cover'])
         self.settings['is_animation_enabled'] = self.animation_var.get()
         self.settings['page_turn_direction'] = self.direction_var.get()
+        self.settings['spread_mode'] = self.spread_mode_var.get()
+        self.settings['spread_single_cover'] = self.spread_single_cover_var.get()
+        try:
+            self.settings['prefetch_pages'] = max(0, int(self.prefetch_pages_var.get()))
+            self.settings['prefetch_workers'] = max(1, int(self.prefetch_workers_var.get()))
+            self.settings['page_cache_mb'] = max(16, int(self.page_cache_mb_var.get()))
+        except (tk.TclError, ValueError):
+            pass # 数値以外が入力された場合は以前の値を維持
+        self.settings['latency_stats'] = self.latency_stats_var.get()
+        self.latency.enabled = self.settings['latency_stats'] or self.latency_overlay_visible
+        self.prefetcher.configure(self.settings['prefetch_workers'])
+        self.page_cache.set_budget(self.settings['page_cache_mb'])
 
         self.save_settings()
         
@@ -567,6 +3293,71 @@ class BookManagerApp:
         self.settings_window.grab_release()
         self.settings_window.destroy()
 
+        # 見開きの組み方が変わった場合は、表示中のページから表示し直す
+        new_layout = (self.settings['page_turn_direction'], self.settings['spread_mode'], self.settings['spread_single_cover'])
+        if new_layout != layout and self.current_spread:
+            self.load_page_image(self.current_spread[0], is_animation=False, direction='next')
+
+    # ====================================================
+    # 処理時間の計測
+    # ====================================================
+
+    def toggle_latency_overlay(self, event=None):
+        """処理時間のオーバーレイ表示を切り替えます。(表示中は設定に関わらず計測する)"""
+        self.latency_overlay_visible = not self.latency_overlay_visible
+        self.latency.enabled = self.settings['latency_stats'] or self.latency_overlay_visible
+        if self.latency_overlay_after_id:
+            self.master.after_cancel(self.latency_overlay_after_id)
+            self.latency_overlay_after_id = None
+        if self.latency_overlay_visible:
+            self.refresh_latency_overlay()
+        else:
+            self.preview_canvas.delete('latency_overlay')
+
+    def refresh_latency_overlay(self):
+        """表示中のオーバーレイを定期的に更新します。"""
+        self.draw_latency_overlay()
+        self.latency_overlay_after_id = self.master.after(self.LATENCY_OVERLAY_MS, self.refresh_latency_overlay)
+
+    def draw_latency_overlay(self):
+        """段階ごとの処理時間 (p50/p95/p99) をプレビューキャンバスの左上に表示します。"""
+        if not self.latency_overlay_visible:
+            return
+        self.preview_canvas.delete('latency_overlay')
+        lines = [f"{'stage':<18}{'n':>6}{'p50':>8}{'p95':>8}{'p99':>8}  ms"]
+        for stage, values in self.latency.summary().items():
+            lines.append(
+                f"{stage:<18}{values['count']:>6}{values['p50_ms']:>8.1f}{values['p95_ms']:>8.1f}{values['p99_ms']:>8.1f}"
+            )
+        if len(lines) == 1:
+            lines.append("(計測データなし)")
+
+        text_id = self.preview_canvas.create_text(
+            10, 10, anchor=tk.NW, text="\n".join(lines),
+            font=('Courier', 9), fill='#00ff88', tags='latency_overlay'
+        )
+        x1, y1, x2, y2 = self.preview_canvas.bbox(text_id)
+        background_id = self.preview_canvas.create_rectangle(
+            x1 - 5, y1 - 5, x2 + 5, y2 + 5, fill='black', outline='', tags='latency_overlay'
+        )
+        self.preview_canvas.tag_lower(background_id, text_id)
+
+    def export_latency_stats(self, extension):
+        """処理時間の集計結果をJSONまたはCSVファイルに書き出します。"""
+        from tkinter import filedialog
+        file_types = [("JSON", "*.json")] if extension == '.json' else [("CSV", "*.csv")]
+        path = filedialog.asksaveasfilename(
+            parent=self.settings_window,
+            defaultextension=extension,
+            filetypes=file_types,
+            initialfile=f"latency{extension}"
+        )
+        if not path:
+            return
+        try:
+            self.latency.export(path)
+        except Exception as e:
+            print(f"処理時間の書き出しエラー: {e}")
 
     # ====================================================
     # プレビュー/スクロール/アニメーションメソッド 
@@ -578,9 +3369,15 @@ class BookManagerApp:
         if not selected_item:
             return
 
-        book_name = self.file_list.item(selected_item)['text']
-        file_path = os.path.join(self.current_folder, book_name)
-        
+        file_path = self.item_paths.get(selected_item)
+        if file_path:
+            self.open_book(file_path, self.file_list.item(selected_item)['text'])
+
+    def open_book(self, file_path, book_name=None):
+        """本を開きます。読書進捗があれば続きから読むか確認します。"""
+        if book_name is None:
+            book_name = os.path.relpath(file_path, self.current_folder)
+
         # 安定的な再読み込みのため、既に開いているかのガード句を削除。
         # 進捗がある限り、常に再開確認ダイアログの判定を行う。
 
@@ -600,15 +3397,15 @@ class BookManagerApp:
             self.current_file_path = file_path
             self.current_book_images = []
             self.current_page_index = -1
+            self.current_spread = ()
+            self.page_sizes = {}
         
         try:
             # 新しいファイルを開く場合は画像を再読み込み
             if not self.current_book_images:
-                with zipfile.ZipFile(file_path, 'r') as z:
-                    # 画像ファイルのみをフィルタリング (self.IMAGE_EXTENSIONSを使用)
-                    images = [name for name in z.namelist() if name.lower().endswith(self.IMAGE_EXTENSIONS)]
-                    # ファイル名を自然順にソート（01.jpg, 02.jpg, ..., 10.jpg の順にするため）
-                    self.current_book_images = sorted(images, key=str.lower)
+                # 画像ファイルのみをファイル名の自然順で取得（01.jpg, 02.jpg, ..., 10.jpg の順にするため）
+                with self.latency.measure('zip.open'):
+                    self.current_book_images = list(self.archive_pool.page_list(file_path, self.IMAGE_EXTENSIONS))
 
                 if not self.current_book_images:
                     self.display_text_message("エラー: このファイルには画像が含まれていません。")
@@ -621,7 +3418,7 @@ class BookManagerApp:
             
             # 最初のページ（または再開ページ）をロード
             # 初回ロード時はアニメーションを無効にする
-            self.load_page_image(start_index, is_animation=False) 
+            self.load_page_image(start_index, is_animation=False, direction='next')
 
         except zipfile.BadZipFile:
             self.display_text_message("エラー: 無効なZIP/CBZファイルです。")
@@ -630,47 +3427,218 @@ class BookManagerApp:
             self.display_text_message(f"ファイル展開エラー: {e}")
             self.update_nav_controls(0, 0)
 
-    def load_page_image(self, index, is_animation=True):
-        """指定されたインデックスの画像をZipから読み込み、表示します。"""
+    def load_page_image(self, index, is_animation=True, direction=None):
+        """指定されたインデックスの画像 (見開き表示ではそのページを含む見開き) を読み込み、表示します。
+
+        表示したページインデックスのタプルを返します。(表示しなかった場合はNone)
+        """
         if self.is_animating:
-            return
+            return None
 
         if not self.current_book_images or index < 0 or index >= len(self.current_book_images):
-            return
+            return None
 
-        direction = 'next' if index > self.current_page_index else 'prev'
+        if direction is None:
+            direction = 'next' if index > self.current_page_index else 'prev'
         
-        image_name = self.current_book_images[index]
         file_path = self.current_file_path
+        self.reset_zoom() # ページを移動したらウィンドウに合わせた表示に戻す
         
         # 設定に基づいてアニメーションを有効にするか最終決定
         use_animation = is_animation and self.settings['is_animation_enabled']
         
-        try:
-            with zipfile.ZipFile(file_path, 'r') as z:
-                with z.open(image_name) as image_file:
-                    image_data = image_file.read()
-                
-                # Pillowがwebpに対応しているため、Image.openで直接読み込めます。
-                img = Image.open(io.BytesIO(image_data))
-                self.original_image = img
-                
+        with self.latency.measure('page.load'):
+            try:
+                target_size = self.get_canvas_size()
+                indices = self.get_spread_indices(index)
+                img = self.get_page_image(file_path, self.get_spread_page_name(indices), target_size)
+                while img is None:
+                    # デコードして横長のページが見つかった場合は、組み合わせを決め直す
+                    # (決め直しても同じ組み合わせなら、無限ループを避けて1ページで表示する)
+                    previous, indices = indices, self.get_spread_indices(index)
+                    if indices == previous:
+                        indices = (index,)
+                    img = self.get_page_image(file_path, self.get_spread_page_name(indices), target_size)
+
+                self.reading_direction = direction
+                self.schedule_prefetch(indices, direction)
+
                 if use_animation:
-                    self.start_page_turn_animation(img, index, direction)
+                    self.start_page_turn_animation(img, indices, direction)
                 else:
                     # アニメーションなしで即時表示 (初回ロードなど)
-                    self.current_page_index = index
-                    self.update_progress(index)
+                    self.original_image = img
+                    self.current_page_key = (file_path, self.get_spread_page_name(indices))
                     self.resize_image_preview(None)
-                    self.update_nav_controls(index + 1, len(self.current_book_images))
-                    self.update_file_list_tag(file_path, index)
+                    self.finish_page_turn(indices)
+                return indices
                 
-        except Exception as e:
-            print(f"画像ロードエラー: {e}")
-            self.display_text_message(f"ページロードエラー: {e}")
-            self.update_nav_controls(0, 0)
+            except Exception as e:
+                print(f"画像ロードエラー: {e}")
+                self.display_text_message(f"ページロードエラー: {e}")
+                self.update_nav_controls(0, 0)
+                return None
+
+    def get_page_image(self, file_path, page_name, target_size):
+        """キャッシュ、先読み済みの画像の順に探し、なければここで読み込みます。
+
+        (キャンバスが拡大されて解像度が足りない場合は読み込み直す)
+        見開きにできないページの組み合わせの場合はNoneを返します。
+        """
+        with self.latency.measure('page.cache_lookup'):
+            img = self.page_cache.get('decoded', (file_path, page_name))
+            if img is None:
+                img = self.prefetcher.take(file_path, page_name)
+        if img is None or (target_size and not is_decoded_enough(img, target_size)):
+            img = self.read_page_image(file_path, page_name, target_size, parallel=True)
+        return img
+
+    # ====================================================
+    # 見開き表示
+    # ====================================================
+
+    def is_page_wide(self, index):
+        """ページが横長か判定します。まだデコードしていないページは縦長とみなします。"""
+        size = self.page_sizes.get((self.current_file_path, self.current_book_images[index]))
+        return size is not None and is_wide_page(size)
+
+    def get_spread_indices(self, index):
+        """indexのページを含む見開きのページインデックスを読む順のタプルで返します。
+
+        見開きは表紙 (単独表示の設定時は2ページ目) から順に2ページずつ組むため、
+        どのページから読み始めても、前後どちらにめくっても同じ組み合わせになります。
+        横長のページは1ページのみで表示し、その次のページから組み直します。
+        (横長かどうかはデコード済みのページのみで判定する)
+        見開き表示でない場合と、表紙 (単独表示の設定時) も1ページのみです。
+        """
+        if not self.settings['spread_mode']:
+            return (index,)
+        first_pair = 1 if self.settings['spread_single_cover'] else 0
+        if index < first_pair or self.is_page_wide(index):
+            return (index,)
+
+        # 直前の横長のページ (なければ表紙) の次から数えて、偶数番目のページから2ページずつ組む
+        anchor = first_pair
+        for previous in range(index - 1, first_pair - 1, -1):
+            if self.is_page_wide(previous):
+                anchor = previous + 1
+                break
+        start = index if (index - anchor) % 2 == 0 else index - 1
+        if start + 1 >= len(self.current_book_images) or self.is_page_wide(start + 1):
+            return (index,)
+        return (start, start + 1)
+
+    def get_adjacent_spread(self, indices, direction):
+        """隣の見開き (direction='next' なら次、'prev' なら前) を返します。なければNoneを返します。"""
+        if direction == 'next':
+            index = indices[-1] + 1
+            if index >= len(self.current_book_images):
+                return None
+        else:
+            index = indices[0] - 1
+            if index < 0:
+                return None
+        return self.get_spread_indices(index)
+
+    def get_spread_page_name(self, indices):
+        """キャッシュや先読みで使うページ名を返します。
+
+        1ページならその画像名、見開きなら左から表示する順の画像名のタプルです。
+        (R2Lでは後のページが左になるため、めくり方向の設定ごとに別のキーになる)
+        """
+        names = tuple(self.current_book_images[i] for i in indices)
+        if len(names) == 1:
+            return names[0]
+        return names[::-1] if self.settings['page_turn_direction'] == 'R2L' else names
+
+    def read_spread_image(self, file_path, image_names, target_size=None, parallel=False):
+        """見開きの各ページを読み込み、連結した表示サイズの画像を返します。(ワーカースレッドからも呼ばれる)
+
+        横長のページが含まれていて見開きにできない場合はNoneを返します。
+        parallel=Trueなら2ページ目を別スレッドで並列にデコードします。
+        """
+        def load(name):
+            img = self.page_cache.get('decoded', (file_path, name), record_stats=False)
+            if img is None or (target_size and not is_decoded_enough(img, target_size)):
+                img = self.read_page_image(file_path, name, target_size)
+            else:
+                # 本を開き直すとpage_sizesは空になるため、キャッシュから取り出したページの大きさも記録する
+                self.page_sizes[(file_path, name)] = img.info.get('source_size', img.size)
+            return img
+
+        if parallel:
+            future = self.spread_executor.submit(load, image_names[1])
+            pages = [load(image_names[0]), future.result()]
+        else:
+            pages = [load(name) for name in image_names]
+        if any(is_wide_page(page.info.get('source_size', page.size)) for page in pages):
+            return None
 
-    def get_resized_photoimage(self, img):
+        with self.latency.measure('spread.compose'):
+            img = compose_spread(pages, target_size)
+        self.page_cache.put('decoded', (file_path, image_names), img)
+        return img
+
+    def read_page_image(self, file_path, image_name, target_size=None, parallel=False):
+        """Zipから画像を読み込み、表示サイズに合わせてデコードします。(ワーカースレッドからも呼ばれるためTkには触れない)
+
+        image_nameが画像名のタプルなら見開きの画像を返します。(read_spread_image)
+        """
+        if isinstance(image_name, tuple):
+            return self.read_spread_image(file_path, image_name, target_size, parallel)
+        with self.latency.measure('zip.read'):
+            image_data = self.archive_pool.read_buffer(file_path, image_name)
+        with self.latency.measure('decode'):
+            img = decode_page_image(image_data, target_size)
+        self.page_sizes[(file_path, image_name)] = img.info['source_size']
+        self.page_cache.put('decoded', (file_path, image_name), img)
+        return img
+
+    def prefetch_page_image(self, file_path, image_name, target_size=None):
+        """先読み用の読み込み処理。十分な解像度でキャッシュ済みのページはデコードしません。
+
+        表示サイズが分かっている場合は、表示用の縮小画像もここで作成してキャッシュします。
+        (PhotoImageの作成はメインスレッドでしかできないため、PIL画像のまま保持する)
+        """
+        img = self.page_cache.get('decoded', (file_path, image_name), record_stats=False)
+        if img is None or (target_size and not is_decoded_enough(img, target_size)):
+            img = self.read_page_image(file_path, image_name, target_size)
+
+        if img is not None and target_size:
+            resized_key = (file_path, image_name, *target_size)
+            if self.page_cache.get('resized', resized_key, record_stats=False) is None:
+                new_size = fit_image_size(img.info.get('source_size', img.size), target_size)
+                resized_img = img if img.size == new_size else img.resize(new_size, Image.Resampling.LANCZOS)
+                self.page_cache.put('resized', resized_key, resized_img)
+        return img
+
+    def get_canvas_size(self):
+        """プレビューキャンバスのサイズを返します。まだ描画されていない場合はNoneを返します。"""
+        canvas_width = self.preview_canvas.winfo_width()
+        canvas_height = self.preview_canvas.winfo_height()
+        if canvas_width < 10 or canvas_height < 10:
+            return None
+        return canvas_width, canvas_height
+
+    def schedule_prefetch(self, indices, direction):
+        """読書方向の次Nページと逆方向の1ページを先読みします。(見開き表示では見開き単位)"""
+        count = self.settings.get('prefetch_pages', 3)
+        opposite = 'prev' if direction == 'next' else 'next'
+
+        # 現在のページも保持対象に含め、すぐに戻った場合も再デコードしない
+        spreads = [indices]
+        for _ in range(count):
+            spread = self.get_adjacent_spread(spreads[-1], direction)
+            if spread is None:
+                break
+            spreads.append(spread)
+        spread = self.get_adjacent_spread(indices, opposite)
+        if spread is not None:
+            spreads.append(spread)
+        names = [self.get_spread_page_name(spread) for spread in spreads]
+        self.prefetcher.schedule(self.current_file_path, names, self.get_canvas_size())
+
+    def get_resized_photoimage(self, img, page_key=None):
         """画像をキャンバスサイズに合わせてリサイズし、PhotoImageを返します。"""
         if not img: return None
 
@@ -680,24 +3648,35 @@ class BookManagerApp:
         if canvas_width < 10 or canvas_height < 10: 
             return None # サイズが小さすぎる場合は無視
 
-        # アスペクト比を維持してリサイズ
-        img_w, img_h = img.size
-        ratio_w = canvas_width / img_w
-        ratio_h = canvas_height / img_h
-        
-        # 常に画像の全てが見えるように、小さい方の比率を採用
-        ratio = min(ratio_w, ratio_h)
-        
-        # 最大サイズはオリジナルサイズの100%まで
-        if ratio > 1:
-            ratio = 1 
+        # 同じページ・同じキャンバスサイズでリサイズ済みならそれを使う
+        self.page_cache.release_pending()
+        cache_key = (*page_key, canvas_width, canvas_height) if page_key else None
+        if cache_key:
+            cached = self.page_cache.get('resized', cache_key)
+            if isinstance(cached, Image.Image):
+                # 先読みスレッドで縮小済みの画像はPhotoImageに変換して置き換える
+                with self.latency.measure('photoimage'):
+                    cached = ImageTk.PhotoImage(cached)
+                self.page_cache.put('resized', cache_key, cached)
+            if cached is not None:
+                self.preview_image = cached
+                return cached
 
-        new_w = int(img_w * ratio)
-        new_h = int(img_h * ratio)
+        # アスペクト比を維持してリサイズ (常に画像の全てが見え、最大サイズは元画像の100%まで)
+        # 縮小デコード済みの画像でも、元画像のサイズを基準に表示サイズを決める
+        source_size = img.info.get('source_size', img.size)
+        new_w, new_h = fit_image_size(source_size, (canvas_width, canvas_height))
         
-        # リサイズ後の画像を保持
-        resized_img = img.resize((new_w, new_h), Image.Resampling.LANCZOS)
-        self.preview_image = ImageTk.PhotoImage(resized_img)
+        # リサイズ後の画像を保持 (縮小デコード済みなら仕上げの小さなリサンプルのみ)
+        if img.size == (new_w, new_h):
+            resized_img = img
+        else:
+            with self.latency.measure('resize'):
+                resized_img = img.resize((new_w, new_h), Image.Resampling.LANCZOS)
+        with self.latency.measure('photoimage'):
+            self.preview_image = ImageTk.PhotoImage(resized_img)
+        if cache_key:
+            self.page_cache.put('resized', cache_key, self.preview_image)
         return self.preview_image
 
     def resize_image_preview(self, event):
@@ -705,12 +3684,29 @@ class BookManagerApp:
         if not self.original_image:
             self.display_placeholder()
             return
+        if self.zoom_scale:
+            self.render_zoom_tiles()
+            return
             
-        self.preview_canvas.delete("all")
-        
-        photo_image = self.get_resized_photoimage(self.original_image)
-        if not photo_image: return
+        with self.latency.measure('preview.redraw'):
+            self.preview_canvas.delete("all")
+
+            # キャンバスが拡大され、縮小デコードした画像では解像度が足りない場合は読み込み直す
+            target_size = self.get_canvas_size()
+            if target_size and self.current_page_key and not is_decoded_enough(self.original_image, target_size):
+                try:
+                    self.original_image = self.read_page_image(*self.current_page_key, target_size) or self.original_image
+                except Exception as e:
+                    print(f"画像ロードエラー: {e}")
+
+            photo_image = self.get_resized_photoimage(self.original_image, self.current_page_key)
+            if not photo_image: return
 
+            self.place_photo_image(photo_image)
+        self.draw_latency_overlay()
+
+    def place_photo_image(self, photo_image):
+        """PhotoImageをキャンバスの中央に配置します。"""
         canvas_w = self.preview_canvas.winfo_width()
         canvas_h = self.preview_canvas.winfo_height()
         img_w = photo_image.width()
@@ -733,74 +3729,162 @@ class BookManagerApp:
         else:
             self.preview_canvas.config(scrollregion=(0, 0, canvas_w, canvas_h), cursor="arrow") # 中央揃え
 
-    def start_page_turn_animation(self, new_img, new_index, direction):
-        """ページめくりアニメーションを開始します。"""
-        self.is_animating = True
+    def on_canvas_configure(self, event):
+        """キャンバスのサイズ変更イベントをまとめて処理します。
+
+        サイズ変更中は軽量なNEAREST縮小で仮描画し、サイズが一定時間変わらなくなった
+        時点で一度だけLANCZOSによる高品質な描画を行います。
+        """
+        if not self.original_image:
+            self.display_placeholder()
+            return
+        if self.zoom_scale:
+            # 拡大表示中はタイルを描き直すだけ (表示範囲の分しか作らないため待たない)
+            self.clamp_zoom_origin()
+            self.render_zoom_tiles()
+            return
+
+        # 古いサイズ向けに予約された高品質描画は取り消す
+        if self.resize_after_id:
+            self.master.after_cancel(self.resize_after_id)
+            self.resize_after_id = None
+
+        canvas_size = self.get_canvas_size()
+        if not canvas_size:
+            return
+
+        # アニメーション中は描画せず、完了後の高品質描画のみ予約する
+        if not self.is_animating and not self.draw_fast_preview(canvas_size):
+            return # 高品質なリサイズ済み画像がキャッシュにあった場合は仕上げ不要
+
+        delay = self.settings.get('resize_debounce_ms', 150)
+        self.resize_after_id = self.master.after(delay, self.finish_resize, canvas_size)
+
+    def draw_fast_preview(self, canvas_size):
+        """リサイズ中の仮描画を行います。仕上げの高品質描画が必要な場合はTrueを返します。"""
+        cached = None
+        if self.current_page_key:
+            cached = self.page_cache.get('resized', (*self.current_page_key, *canvas_size), record_stats=False)
+
         self.preview_canvas.delete("all")
+        if cached is not None and not isinstance(cached, Image.Image):
+            self.preview_image = cached
+            self.place_photo_image(cached)
+            return False
 
-        # 1. 前のページを表示
-        if self.original_image:
-            # 現在表示中の画像をリサイズして保持
-            prev_photo = self.get_resized_photoimage(self.original_image)
-            # 画像の中央位置を取得
-            x, y = self.current_image_coords
-            self.old_image_item_id = self.preview_canvas.create_image(x, y, anchor=tk.NW, image=prev_photo)
-        
-        # 2. 次のページを非表示の位置に準備
+        source_size = self.original_image.info.get('source_size', self.original_image.size)
+        new_size = fit_image_size(source_size, canvas_size)
+        self.preview_image = ImageTk.PhotoImage(self.original_image.resize(new_size, Image.Resampling.NEAREST))
+        self.place_photo_image(self.preview_image)
+        return True
+
+    def finish_resize(self, canvas_size):
+        """サイズが確定した後に高品質な描画を行います。"""
+        self.resize_after_id = None
+        # 予約後にサイズが変わっていれば、新しいイベント側の描画に任せる
+        if self.is_animating or self.get_canvas_size() != canvas_size:
+            return
+        self.resize_image_preview(None)
+
+    def start_page_turn_animation(self, new_img, new_indices, direction):
+        """ページめくりアニメーションを開始します。
+
+        両ページとも描画済みのPhotoImageを使い回し、アニメーション中および終了後には
+        リサイズを行いません。
+        """
+        canvas_size = self.get_canvas_size()
+        old_photo = self.preview_image
+
+        # 次のページを準備 (先読み時に表示サイズへ縮小済みなら、ここではPhotoImage化のみ)
         self.original_image = new_img # 新しい画像をセット
-        self.preview_image = self.get_resized_photoimage(new_img)
-        
-        canvas_w = self.preview_canvas.winfo_width()
-        x, y = self.current_image_coords
-        
-        # アニメーションの開始位置を設定
-        if direction == 'next':
-            start_x = x + canvas_w 
-            end_x = x
-        else: # direction == 'prev'
-            start_x = x - canvas_w
-            end_x = x
+        self.current_page_key = (self.current_file_path, self.get_spread_page_name(new_indices))
+        new_photo = self.get_resized_photoimage(new_img, self.current_page_key)
 
-        self.image_item_id = self.preview_canvas.create_image(start_x, y, anchor=tk.NW, image=self.preview_image)
-        
-        # 3. アニメーション開始
-        self.animate_page_turn(new_img, new_index, direction, step=0)
-
-    def animate_page_turn(self, new_image, new_index, direction, step=0):
-        """ページめくりアニメーションを実行します。"""
-        if step > 20: # アニメーション終了
-            self.is_animating = False
-            if self.old_image_item_id:
-                self.preview_canvas.delete(self.old_image_item_id)
-                self.old_image_item_id = None
-            
-            # 最終的な状態を更新
-            self.current_page_index = new_index
-            self.original_image = new_image
-            self.resize_image_preview(None) # 画像をリセットして中央に再配置
-            self.update_progress(new_index)
-            self.update_nav_controls(new_index + 1, len(self.current_book_images))
-            self.update_file_list_tag(self.current_file_path, new_index)
+        if not canvas_size or not new_photo:
+            # キャンバスが描画されていない場合はアニメーションせずに表示
+            self.resize_image_preview(None)
+            self.finish_page_turn(new_indices)
             return
 
-        # 1ステップあたりの移動量 (キャンバス幅 / ステップ数)
-        canvas_w = self.preview_canvas.winfo_width()
-        delta_x = canvas_w / 20
-        
-        move_amount = delta_x
-        if direction == 'next':
-            move_amount *= -1 # 左へ移動
-            
-        # 前のページと新しいページを同時に移動
+        self.is_animating = True
+        self.preview_canvas.delete("all")
+        canvas_w, canvas_h = canvas_size
+
+        # 1. 前のページを現在の位置に表示 (表示中のPhotoImageをそのまま使う)
+        old_x, old_y = self.current_image_coords
+        if old_photo:
+            self.old_image_item_id = self.preview_canvas.create_image(old_x, old_y, anchor=tk.NW, image=old_photo)
+
+        # 2. 次のページを画面外の開始位置に配置
+        end_x = (canvas_w - new_photo.width()) // 2
+        end_y = (canvas_h - new_photo.height()) // 2
+        offset = canvas_w if direction == 'next' else -canvas_w
+        self.image_item_id = self.preview_canvas.create_image(end_x + offset, end_y, anchor=tk.NW, image=new_photo)
+
+        # 3. アニメーション開始 (ステップ数ではなく経過時間で位置を決める)
+        self.animation_state = {
+            'start_time': time.perf_counter(),
+            'duration': self.settings.get('animation_duration_ms', 250) / 1000,
+            'old_photo': old_photo,        # アニメーション中は参照を保持
+            'old_x': old_x,
+            'old_y': old_y,
+            'end_x': end_x,
+            'end_y': end_y,
+            'offset': offset,
+            'new_indices': new_indices,
+            'canvas_size': canvas_size,
+        }
+        self.animate_page_turn()
+
+    def animate_page_turn(self):
+        """ページめくりアニメーションの1フレームを描画します。
+
+        位置は経過時間から求めるため、描画が遅れた場合はフレームが間引かれ、
+        アニメーション全体の時間は延びません。
+        """
+        state = self.animation_state
+        elapsed = time.perf_counter() - state['start_time']
+        progress = min(1.0, elapsed / state['duration']) if state['duration'] > 0 else 1.0
+        eased = 1 - (1 - progress) ** 3 # ease-out (cubic)
+
+        shift = state['offset'] * eased
         if self.old_image_item_id:
-            self.preview_canvas.move(self.old_image_item_id, move_amount, 0)
-        self.preview_canvas.move(self.image_item_id, move_amount, 0)
-        
-        self.master.after(10, self.animate_page_turn, new_image, new_index, direction, step + 1)
+            self.preview_canvas.coords(self.old_image_item_id, state['old_x'] - shift, state['old_y'])
+        self.preview_canvas.coords(self.image_item_id, state['end_x'] + state['offset'] - shift, state['end_y'])
+
+        if progress < 1.0:
+            self.master.after(self.ANIMATION_FRAME_MS, self.animate_page_turn)
+            return
+
+        # アニメーション終了
+        self.is_animating = False
+        self.animation_state = None
+        if self.old_image_item_id:
+            self.preview_canvas.delete(self.old_image_item_id)
+            self.old_image_item_id = None
+
+        # 最終的な状態を更新 (新しいページは既に中央に配置済み)
+        self.current_image_coords = (state['end_x'], state['end_y'])
+        self.finish_page_turn(state['new_indices'])
+
+        # アニメーション中にキャンバスのサイズが変わっていた場合のみ描画し直す
+        if self.get_canvas_size() != state['canvas_size']:
+            self.on_canvas_configure(None)
+
+    def finish_page_turn(self, new_indices):
+        """ページ移動後の現在位置/進捗/ナビゲーション/ファイルリストを更新します。"""
+        total = len(self.current_book_images)
+        self.current_spread = tuple(new_indices)
+        self.current_page_index = new_indices[0]
+        # 見開きで最終ページまで表示した場合は、読了として最終ページを記録する
+        progress_index = new_indices[-1] if new_indices[-1] == total - 1 else new_indices[0]
+        self.update_progress(progress_index)
+        self.update_nav_controls(new_indices[0] + 1, total, new_indices[-1] + 1)
+        self.update_file_list_tag(self.current_file_path, progress_index)
 
     def start_scroll(self, event):
         """スクロール操作（ドラッグ）の開始を記録します。"""
-        if not self.image_item_id or self.is_animating:
+        if not (self.image_item_id or self.zoom_scale) or self.is_animating:
             return
             
         self.scroll_start_x = event.x
@@ -809,6 +3893,9 @@ class BookManagerApp:
 
     def do_scroll(self, event):
         """ドラッグ中に画像を移動します。"""
+        if self.zoom_scale and not self.is_animating:
+            self.do_zoom_scroll(event)
+            return
         if not self.image_item_id or self.is_animating or not self.preview_image:
             return
         
@@ -861,7 +3948,7 @@ class BookManagerApp:
 
     def stop_scroll(self, event):
         """マウスリリース時にドラッグでなかった場合、クリックとしてページ移動を処理します。"""
-        if not self.image_item_id or self.is_animating:
+        if not (self.image_item_id or self.zoom_scale) or self.is_animating:
             self.is_dragging = False
             return
             
@@ -901,71 +3988,271 @@ class BookManagerApp:
         elif event.num == 5 or (event.delta < 0 and event.num != 4):
             # スクロールダウン (次へ)
             direction = -1
+
+        if direction and event.state & 0x4:
+            # Ctrl+ホイールはマウス位置を中心に拡大/縮小
+            self.zoom_by(self.ZOOM_STEP if direction == 1 else 1 / self.ZOOM_STEP, (event.x, event.y))
+            return
+        if direction and self.zoom_scale:
+            # 拡大表示中は上下にスクロール
+            self.pan_zoom(0, direction * self.preview_canvas.winfo_height() // 5)
+            return
             
         if direction == 1:
             self.prev_page()
         elif direction == -1:
             self.next_page()
 
+    # ====================================================
+    # 拡大表示
+    # ====================================================
+
+    def on_zoom_key(self, event, factor):
+        """+/-/0キーで拡大/縮小します。(factor=Noneでウィンドウに合わせる、入力欄では無視)"""
+        if self.is_text_input(event):
+            return
+        if factor is None:
+            if self.zoom_scale:
+                self.reset_zoom()
+                self.resize_image_preview(None)
+            return
+        self.zoom_by(factor)
+
+    def get_fit_scale(self, canvas_size):
+        """ウィンドウに合わせて表示しているときの倍率 (原寸比) を返します。"""
+        source_size = self.original_image.info.get('source_size', self.original_image.size)
+        return fit_image_size(source_size, canvas_size)[0] / source_size[0]
+
+    def zoom_by(self, factor, anchor=None):
+        """表示倍率をfactor倍にします。anchor (キャンバス座標、省略時は中央) の位置を固定して拡大します。
+
+        ウィンドウに合わせた倍率より小さくなる場合は通常の表示に戻ります。
+        """
+        canvas_size = self.get_canvas_size()
+        if not self.original_image or self.is_animating or not self.current_page_key or not canvas_size:
+            return
+        fit_scale = self.get_fit_scale(canvas_size)
+        current_scale = self.zoom_scale or fit_scale
+        new_scale = min(self.ZOOM_MAX, current_scale * factor)
+        if new_scale <= fit_scale * 1.001:
+            if self.zoom_scale:
+                self.reset_zoom()
+                self.resize_image_preview(None)
+            return
+        if new_scale == current_scale:
+            return
+
+        if self.zoom_pyramid is None:
+            # 必要な解像度のデコードが終わるまでは、表示中の画像を拡大したタイルで代用する
+            self.zoom_pyramid = TilePyramid(self.original_image)
+            self.zoom_origin = self.current_image_coords
+
+        # anchorの位置にある画像上の点が、拡大後も同じ位置に来るように左上の座標を決める
+        anchor_x, anchor_y = anchor or (canvas_size[0] / 2, canvas_size[1] / 2)
+        ratio = new_scale / current_scale
+        origin_x, origin_y = self.zoom_origin
+        self.zoom_origin = (round(anchor_x - (anchor_x - origin_x) * ratio), round(anchor_y - (anchor_y - origin_y) * ratio))
+        self.zoom_scale = new_scale
+        self.zoom_pyramid.drop_finer(new_scale)
+        self.request_zoom_source()
+
+        self.image_item_id = None
+        self.preview_canvas.delete("all")
+        self.zoom_tile_items = {}
+        self.clamp_zoom_origin()
+        self.render_zoom_tiles()
+
+    def request_zoom_source(self):
+        """表示倍率に必要な解像度の画像を、バックグラウンドでデコードします。
+
+        拡大表示用の画像はページキャッシュを使わず、倍率に合わせて縮小デコードし直します。
+        (JPEGはドラフトモード、それ以外はreduce。原寸でデコードするのは倍率が1/2を超えたときだけ)
+        保持している画像で足りる場合や、十分な解像度のデコードを待っている場合は何もしません。
+        デコードが終わると on_zoom_source_ready でタイルを差し替えます。
+        """
+        scale = min(self.zoom_scale, 1.0)
+        if self.zoom_pyramid.has_resolution(scale) or (self.zoom_request_scale or 0) >= scale:
+            return
+        self.zoom_request_scale = scale
+        generation = self.zoom_generation
+        page_key = self.current_page_key
+        target_size = self.zoom_pyramid.display_size(scale)
+
+        def decode():
+            source = None
+            try:
+                with self.latency.measure('zoom.source'):
+                    source = self.read_zoom_source(*page_key, target_size)
+            except Exception as e:
+                print(f"画像ロードエラー: {e}")
+            self.post_to_ui(self.on_zoom_source_ready, generation, scale, source)
+
+        threading.Thread(target=decode, name="zoom-decode", daemon=True).start()
+
+    def on_zoom_source_ready(self, generation, scale, source):
+        """デコードが終わった画像で、拡大表示のタイルを作り直します。"""
+        # 待っている間に拡大表示が終わった (ページの移動を含む) 場合は捨てる
+        if generation != self.zoom_generation:
+            return
+        if self.zoom_request_scale == scale:
+            self.zoom_request_scale = None
+        # 待っている間に縮小して、保持している画像で足りるようになった場合も捨てる
+        if source is None or source.width <= self.zoom_pyramid.image.width:
+            return
+        self.zoom_pyramid = TilePyramid(source)
+        self.zoom_pyramid.drop_finer(self.zoom_scale)
+        self.preview_canvas.delete('zoom_tile')
+        self.zoom_tile_items = {}
+        self.render_zoom_tiles()
+
+    def read_zoom_source(self, file_path, page_name, target_size=None):
+        """拡大表示用に、ページ (見開きなら連結した画像) をtarget_size以上の解像度でデコードします。(省略時は原寸)"""
+        names = page_name if isinstance(page_name, tuple) else (page_name,)
+        pages = []
+        for name in names:
+            with self.latency.measure('zip.read'):
+                image_data = self.archive_pool.read_buffer(file_path, name)
+            with self.latency.measure('decode'):
+                pages.append(decode_page_image(image_data, target_size))
+        return pages[0] if len(pages) == 1 else compose_spread(pages, target_size)
+
+    def reset_zoom(self):
+        """拡大表示を終了し、タイルと拡大用の画像を破棄します。"""
+        if self.zoom_scale is None and self.zoom_pyramid is None:
+            return
+        self.preview_canvas.delete('zoom_tile')
+        self.zoom_tile_items = {}
+        self.zoom_scale = None
+        self.zoom_pyramid = None
+        self.zoom_generation += 1
+        self.zoom_request_scale = None
+
+    def clamp_zoom_origin(self):
+        """拡大した画像がキャンバスからはみ出さないように左上の座標を調整します。(小さい辺は中央に配置)"""
+        canvas_size = self.get_canvas_size()
+        if not canvas_size:
+            return
+        image_size = self.zoom_pyramid.display_size(self.zoom_scale)
+        origin = []
+        for position, image_length, canvas_length in zip(self.zoom_origin, image_size, canvas_size):
+            if image_length <= canvas_length:
+                origin.append((canvas_length - image_length) // 2)
+            else:
+                origin.append(min(0, max(canvas_length - image_length, position)))
+        self.zoom_origin = tuple(origin)
+
+    def render_zoom_tiles(self):
+        """表示範囲に重なるタイルだけを配置し、範囲外になったタイルを破棄します。"""
+        canvas_size = self.get_canvas_size()
+        if not canvas_size or not self.zoom_pyramid:
+            return
+        pyramid = self.zoom_pyramid
+        size = TilePyramid.TILE_SIZE
+        # タイルのキャッシュは表示範囲の約2画面分まで (原寸の大きさに依存しない)
+        pyramid.max_tiles = 2 * (canvas_size[0] // size + 2) * (canvas_size[1] // size + 2)
+
+        with self.latency.measure('zoom.render'):
+            visible = set(pyramid.tile_range(self.zoom_scale, self.zoom_origin, canvas_size))
+            for key in [key for key in self.zoom_tile_items if key not in visible]:
+                self.preview_canvas.delete(self.zoom_tile_items.pop(key)[0])
+
+            origin_x, origin_y = self.zoom_origin
+            for column, row in visible:
+                x, y = origin_x + column * size, origin_y + row * size
+                placed = self.zoom_tile_items.get((column, row))
+                if placed:
+                    self.preview_canvas.coords(placed[0], x, y)
+                    continue
+                with self.latency.measure('zoom.tile'):
+                    photo = ImageTk.PhotoImage(pyramid.get_tile(self.zoom_scale, column, row))
+                item_id = self.preview_canvas.create_image(x, y, anchor=tk.NW, image=photo, tags='zoom_tile')
+                self.zoom_tile_items[(column, row)] = (item_id, photo)
+
+        self.current_image_coords = self.zoom_origin
+        self.preview_canvas.config(cursor="fleur")
+        self.draw_latency_overlay()
+
+    def pan_zoom(self, dx, dy):
+        """拡大表示の範囲を移動します。"""
+        origin_x, origin_y = self.zoom_origin
+        self.zoom_origin = (origin_x + dx, origin_y + dy)
+        self.clamp_zoom_origin()
+        self.render_zoom_tiles()
+
+    def do_zoom_scroll(self, event):
+        """拡大表示中のドラッグで表示範囲を移動します。"""
+        dx = event.x - self.scroll_start_x
+        dy = event.y - self.scroll_start_y
+        if abs(dx) > 5 or abs(dy) > 5:
+            self.is_dragging = True
+        if not self.is_dragging:
+            return
+        self.pan_zoom(dx, dy)
+        self.scroll_start_x = event.x
+        self.scroll_start_y = event.y
+
     def next_book(self):
         """次の本に移動します。"""
         if not self.current_file_path or not self.files:
             return
             
-        try:
-            current_index = self.files.index(self.current_file_path)
-            next_index = current_index + 1
-            if next_index < len(self.files):
-                next_file_path = self.files[next_index]
-                resume_index = self.reading_progress.get(next_file_path, 0)
-                self.display_preview(next_file_path, resume_index)
-        except ValueError:
+        current_index = self.get_file_position(self.current_file_path)
+        if current_index is None:
             # 現在のファイルパスがリストに見つからない場合
-            pass
+            return
+        next_index = current_index + 1
+        if next_index < len(self.files):
+            next_file_path = self.files[next_index]
+            resume_index = self.reading_progress.get(next_file_path, 0)
+            self.display_preview(next_file_path, resume_index)
 
     def prev_book(self):
         """前の本に移動します。"""
         if not self.current_file_path or not self.files:
             return
             
-        try:
-            current_index = self.files.index(self.current_file_path)
-            prev_index = current_index - 1
-            if prev_index >= 0:
-                prev_file_path = self.files[prev_index]
-                resume_index = self.reading_progress.get(prev_file_path, 0)
-                self.display_preview(prev_file_path, resume_index)
-        except ValueError:
-            pass
+        current_index = self.get_file_position(self.current_file_path)
+        if current_index is None:
+            return
+        prev_index = current_index - 1
+        if prev_index >= 0:
+            prev_file_path = self.files[prev_index]
+            resume_index = self.reading_progress.get(prev_file_path, 0)
+            self.display_preview(prev_file_path, resume_index)
 
 
     # ====================================================
     # ページめくりメソッド
     # ====================================================
 
+    def is_text_input(self, event):
+        """キーイベントが入力欄 (検索欄や設定の数値欄) で発生したか返します。"""
+        return isinstance(event.widget, (tk.Entry, ttk.Entry, tk.Spinbox))
+
     def next_page(self):
-        """次のページに移動します。（アニメーション制御はload_page_image内）"""
-        if self.is_animating: return
-        if self.current_page_index < len(self.current_book_images) - 1:
-            next_index = self.current_page_index + 1
-            self.load_page_image(next_index, is_animation=True)
+        """次のページ (見開き表示では次の見開き) に移動します。（アニメーション制御はload_page_image内）"""
+        if self.is_animating or not self.current_spread: return
+        if self.current_spread[-1] < len(self.current_book_images) - 1:
+            shown = self.load_page_image(self.current_spread[-1] + 1, is_animation=True, direction='next')
             
             # 最終ページに到達したか確認
-            if next_index == len(self.current_book_images) - 1:
+            if shown and shown[-1] == len(self.current_book_images) - 1:
                 self.master.after(50, self.ask_next_book_dialog) 
 
     def prev_page(self):
-        """前のページに移動します。（アニメーション制御はload_page_image内）"""
-        if self.is_animating: return
-        if self.current_page_index > 0:
-            self.load_page_image(self.current_page_index - 1, is_animation=True)
+        """前のページ (見開き表示では前の見開き) に移動します。（アニメーション制御はload_page_image内）"""
+        if self.is_animating or not self.current_spread: return
+        if self.current_spread[0] > 0:
+            self.load_page_image(self.current_spread[0] - 1, is_animation=True, direction='prev')
 
-    def update_nav_controls(self, current, total):
-        """ページ番号ラベルとボタンの状態を更新します。"""
+    def update_nav_controls(self, current, total, last=None):
+        """ページ番号ラベルとボタンの状態を更新します。(lastは見開きで表示中の最後のページ番号)"""
+        last = last or current
         if total > 0:
-            self.page_label.config(text=f"ページ: {current} / {total}")
+            label = f"{current}-{last}" if last != current else f"{current}"
+            self.page_label.config(text=f"ページ: {label} / {total}")
             # ボタンの状態は、ページインデックスが0未満か最大値以上かで判断
-            self.next_button.config(state=tk.NORMAL if current < total else tk.DISABLED)
+            self.next_button.config(state=tk.NORMAL if last < total else tk.DISABLED)
             self.prev_button.config(state=tk.NORMAL if current > 1 else tk.DISABLED)
         else:
             self.page_label.config(text="ページ: - / -")
@@ -978,14 +4265,8 @@ class BookManagerApp:
         if not file_path.startswith(self.current_folder):
             return
 
-        book_name = os.path.basename(file_path)
-        
-        # Treeviewを検索して該当アイテムを見つける
-        item_id = None
-        for item in self.file_list.get_children():
-            if self.file_list.item(item, 'text') == book_name:
-                item_id = item
-                break
+        # パスからTreeviewのアイテムを直接引く (書籍数に依存しない)
+        item_id = self.file_items.get(file_path)
         
         if item_id:
             total_pages = len(self.current_book_images)
@@ -995,13 +4276,30 @@ class BookManagerApp:
                 tag = 'reading' # 読書中
             else:
                 tag = 'normal' # 未読または最初から
+            if self.is_broken(file_path):
+                tag = 'broken'
 
             self.file_list.item(item_id, tags=(tag,))
 
+        # グリッド/仮想化リストは表示範囲だけを描き直す
+        self.refresh_visible_rows()
+
     def get_book_name(self, file_path):
         """ファイルパスから拡張子を除いたファイル名を返します。"""
         return os.path.splitext(os.path.basename(file_path))[0]
 
+    def on_closing(self):
+        """ウィンドウを閉じる際にバックグラウンド処理を停止します。"""
+        self.stop_folder_watcher()
+        self.scan_cancel_event.set()
+        self.cancel_verification()
+        self.thumbnail_service.shutdown()
+        self.prefetcher.shutdown()
+        self.spread_executor.shutdown(wait=False, cancel_futures=True)
+        self.archive_pool.close_all()
+        self.reading_progress.close() # 未保存の読書進捗を書き出す
+        self.master.destroy()
+
     # ====================================================
     # ダイアログ
     # ====================================================
@@ -1009,8 +4307,9 @@ class BookManagerApp:
     # 修正: file_pathを引数に追加し、on_file_selectから渡されたパスを使用するように変更
     def ask_resume_dialog(self, file_path, book_name, resume_index):
         """続きから読むかを確認するダイアログ。"""
-        if self.Messagebox:
-            result = self.Messagebox.yesnocancel(
+        messagebox = self.get_messagebox()
+        if messagebox:
+            result = messagebox.yesnocancel(
                 f"「{book_name}」\n続き({resume_index + 1}ページ)から読みますか？", 
                 title="読書再開の確認",
             )
@@ -1029,39 +4328,318 @@ class BookManagerApp:
         if not self.current_file_path or not self.files:
             return
 
-        try:
-            current_index = self.files.index(self.current_file_path)
-            next_index = current_index + 1
-            if next_index < len(self.files):
-                next_book_name = self.get_book_name(self.files[next_index])
+        current_index = self.get_file_position(self.current_file_path)
+        if current_index is None:
+            return # リストにない場合はスキップ
+
+        next_index = current_index + 1
+        if next_index < len(self.files):
+            next_book_name = self.get_book_name(self.files[next_index])
+            
+            messagebox = self.get_messagebox()
+            if messagebox:
+                result = messagebox.yesno(
+                    f"最終ページです。次の本「{next_book_name}」に進みますか？",
+                    title="次の本へ",
+                )
                 
-                if self.Messagebox:
-                    result = self.Messagebox.yesno(
-                        f"最終ページです。次の本「{next_book_name}」に進みますか？",
-                        title="次の本へ",
-                    )
-                    
-                    if result == 'Yes':
-                        self.next_book()
-                else:
-                    # ttkbootstrapがない場合の簡易的な動作
+                if result == 'Yes':
                     self.next_book()
-        except ValueError:
-            pass # リストにない場合はスキップ
+            else:
+                # ttkbootstrapがない場合の簡易的な動作
+                self.next_book()
 
 
-if __name__ == '__main__':
-    # ttkbootstrapをインポート
+def create_main_window():
+    """メインウィンドウを作成します。(ttkbootstrapがあればテーマを適用したウィンドウ)"""
     try:
         import ttkbootstrap as ttkb
-        root = ttkb.Window(themename="superhero")
+        return ttkb.Window(themename="superhero")
     except ImportError:
-        root = tk.Tk()
-        
+        return tk.Tk()
+
+
+# ====================================================
+# バッチ処理 (コマンドライン)
+# ====================================================
+
+def page_count_job(file_path, image_extensions):
+    """プロセスプールで実行するページ数の計算。(ファイルパス, ページ数, エラー) を返します。"""
+    try:
+        return file_path, count_archive_pages(file_path, image_extensions), None
+    except Exception as e:
+        return file_path, None, str(e)
+
+
+def thumbnail_job(record, cache_dir, image_extensions):
+    """プロセスプールで実行するサムネイル作成。(ファイルパス, キャッシュのパス, エラー) を返します。"""
+    try:
+        cache_path = generate_thumbnail(
+            record['path'], record['size_bytes'], record['date_mod'], cache_dir, image_extensions
+        )
+        return record['path'], cache_path, None
+    except Exception as e:
+        return record['path'], None, str(e)
+
+
+def run_process_jobs(job, items, workers, label, *job_args):
+    """itemsの各要素にjobをプロセスプールで実行し、完了した順に結果を返すジェネレータ。(進捗は標準エラーに表示)"""
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    total = len(items)
+    if not total:
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(job, item, *job_args) for item in items]
+        for done, future in enumerate(as_completed(futures), 1):
+            yield future.result()
+            if done == total or done % 50 == 0:
+                print(f"\r{label}: {done} / {total}", end="" if done < total else "\n", file=sys.stderr, flush=True)
+
+
+def update_library_index(index, folder, recursive, workers):
+    """フォルダをスキャンしてインデックスと照合し、ページ数が不明な書籍のページ数を計算します。
+
+    インデックス内のフォルダのレコードを返します。
+    """
+    scanned = scan_book_files(folder, BOOK_EXTENSIONS, recursive)
+    changed, removed = index.reconcile(folder, scanned, recursive)
+    print(f"スキャン: {len(scanned)} 冊 (追加/変更 {len(changed)}, 削除 {len(removed)})", file=sys.stderr)
+
+    missing = [record['path'] for record in index.get_folder(folder, recursive) if record['page_count'] is None]
+    page_counts = {}
+    errors = 0
+    for file_path, page_count, error in run_process_jobs(page_count_job, missing, workers, "ページ数", IMAGE_EXTENSIONS):
+        if error:
+            errors += 1
+            print(f"ページ数取得エラー: {file_path}: {error}", file=sys.stderr)
+            continue
+        page_counts[file_path] = page_count
+        if len(page_counts) >= BookManagerApp.PAGE_COUNT_BATCH:
+            index.set_page_counts(page_counts)
+            page_counts = {}
+    index.set_page_counts(page_counts)
+    if errors:
+        print(f"ページ数を取得できなかった書籍: {errors} 冊", file=sys.stderr)
+    return index.get_folder(folder, recursive)
+
+
+def warm_thumbnails(records, cache_dir, workers):
+    """サムネイルが未作成の書籍について、サムネイルを作成します。"""
+    missing = [
+        record for record in records
+        if not os.path.exists(thumbnail_cache_path(cache_dir, record['path'], record['size_bytes'], record['date_mod']))
+    ]
+    print(f"サムネイル: {len(records) - len(missing)} 冊は作成済み、{len(missing)} 冊を作成します", file=sys.stderr)
+    errors = 0
+    for file_path, _, error in run_process_jobs(thumbnail_job, missing, workers, "サムネイル", cache_dir, IMAGE_EXTENSIONS):
+        if error:
+            errors += 1
+            print(f"サムネイル作成エラー: {file_path}: {error}", file=sys.stderr)
+    return errors
+
+
+def reading_status(last_page, page_count):
+    """読書進捗の状態 ('read', 'reading', 'unread') を返します。(ファイルリストのタグと同じ基準)"""
+    if page_count and last_page >= page_count - 1 and last_page > 0:
+        return 'read'
+    if last_page > 0:
+        return 'reading'
+    return 'unread'
+
+
+def command_index(args):
+    """index: スキャンしてインデックスを更新し、ページ数を計算します。"""
+    index = LibraryIndex(args.db)
+    update_library_index(index, args.folder, args.recursive, args.workers)
+    return 0
+
+
+def command_thumbnails(args):
+    """thumbnails: インデックスの書籍のサムネイルを作成します。"""
+    index = LibraryIndex(args.db)
+    records = index.get_folder(args.folder, args.recursive)
+    if not records:
+        records = update_library_index(index, args.folder, args.recursive, args.workers)
+    return 1 if warm_thumbnails(records, args.thumbnail_dir, args.workers) else 0
+
+
+def command_warm(args):
+    """warm: インデックス/ページ数/サムネイルをまとめて準備します。"""
+    index = LibraryIndex(args.db)
+    records = update_library_index(index, args.folder, args.recursive, args.workers)
+    return 1 if warm_thumbnails(records, args.thumbnail_dir, args.workers) else 0
+
+
+def command_verify(args):
+    """verify: 書籍の整合性 (CRCと画像ヘッダー) をチェックします。"""
+    index = LibraryIndex(args.db)
+    records = update_library_index(index, args.folder, args.recursive, args.workers)
+    pending = records if args.all else [record for record in records if record['integrity'] is None]
+    print(f"整合性チェック: {len(records) - len(pending)} 冊はチェック済み、{len(pending)} 冊をチェックします", file=sys.stderr)
+
+    results = []
+    for done, result in enumerate(iter_verification_results(pending, IMAGE_EXTENSIONS, args.workers, args.io_limit), 1):
+        results.append(result)
+        if result['status'] == 'broken':
+            print(f"\r破損: {result['path']}: {result['error']}", file=sys.stderr)
+        if len(results) >= 50 or done == len(pending):
+            index.set_verifications(results)
+            results = []
+            print(f"\r整合性チェック: {done} / {len(pending)}", end="" if done < len(pending) else "\n", file=sys.stderr, flush=True)
+
+    broken = [record for record in index.get_folder(args.folder, args.recursive) if record['integrity'] == 'broken']
+    for record in broken:
+        print(record['path'])
+    print(f"破損している書籍: {len(broken)} 冊", file=sys.stderr)
+    return 1 if broken else 0
+
+
+def command_list(args):
+    """list: 書籍の一覧と統計を表示します。"""
+    index = LibraryIndex(args.db)
+    records = index.get_folder(args.folder, args.recursive)
+    if args.scan or not records:
+        records = update_library_index(index, args.folder, args.recursive, args.workers)
+    progress = ProgressStore(args.progress)
+
+    rows = []
+    for record in sorted(records, key=lambda record: natural_sort_key(os.path.relpath(record['path'], args.folder))):
+        last_page = progress.get(record['path'], 0)
+        rows.append({
+            'name': os.path.relpath(record['path'], args.folder),
+            'pages': record['page_count'],
+            'size_bytes': record['size_bytes'],
+            'modified': datetime.datetime.fromtimestamp(record['date_mod']).strftime("%Y/%m/%d %H:%M"),
+            'last_page': last_page + 1 if last_page else None,
+            'status': 'broken' if record['integrity'] == 'broken' else reading_status(last_page, record['page_count']),
+        })
+
+    if args.format == 'json':
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+    elif args.format == 'csv':
+        writer = csv.DictWriter(sys.stdout, fieldnames=list(rows[0]) if rows else ['name'])
+        writer.writeheader()
+        writer.writerows(rows)
+    else:
+        for row in rows:
+            pages = '' if row['pages'] is None else row['pages']
+            last_page = '' if row['last_page'] is None else row['last_page']
+            print(f"{pages:>5} {row['size_bytes'] / (1024 * 1024):8.1f} MB  {row['modified']}  {last_page:>5}  {row['status']:<7}  {row['name']}")
+
+    # 統計は表の後 (JSON/CSVでは標準エラー) に表示する
+    statuses = [row['status'] for row in rows]
+    total_pages = sum(row['pages'] or 0 for row in rows)
+    total_mb = sum(row['size_bytes'] for row in rows) / (1024 * 1024)
+    summary = (f"合計: {len(rows)} 冊, {total_pages} ページ, {total_mb:.1f} MB "
+               f"(読了 {statuses.count('read')}, 読書中 {statuses.count('reading')}, 未読 {statuses.count('unread')}, "
+               f"破損 {statuses.count('broken')})")
+    print(summary, file=sys.stdout if args.format == 'table' else sys.stderr)
+    return 0
+
+
+def command_export_progress(args):
+    """export-progress: 読書進捗をJSONまたはCSVで書き出します。"""
+    progress = ProgressStore(args.progress)
+    page_counts = {}
+    if os.path.exists(args.db):
+        index = LibraryIndex(args.db)
+        with index.connect() as conn:
+            page_counts = dict(conn.execute("SELECT path, page_count FROM books"))
+
+    entries = sorted(progress.items())
+    if args.folder:
+        prefix = os.path.join(args.folder, '')
+        entries = [(path, page) for path, page in entries if path.startswith(prefix)]
+    rows = [
+        {'path': path, 'page': page + 1, 'page_count': page_counts.get(path),
+         'status': reading_status(page, page_counts.get(path))}
+        for path, page in entries
+    ]
+
+    output = open(args.output, 'w', encoding='utf-8', newline='') if args.output else sys.stdout
+    try:
+        if args.format == 'csv':
+            writer = csv.DictWriter(output, fieldnames=['path', 'page', 'page_count', 'status'])
+            writer.writeheader()
+            writer.writerows(rows)
+        else:
+            json.dump(rows, output, ensure_ascii=False, indent=2)
+            output.write("\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    print(f"{len(rows)} 冊分の読書進捗を書き出しました", file=sys.stderr)
+    return 0
+
+
+def build_arg_parser():
+    """コマンドライン引数のパーサーを作成します。(サブコマンドなしはGUIを起動)"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="自炊本管理ソフト")
+    parser.add_argument('--startup-report', action='store_true', help="GUIの起動にかかった時間の内訳を表示する")
+    subparsers = parser.add_subparsers(dest='command', metavar='COMMAND')
+
+    subparsers.add_parser('gui', help="GUIを起動する (既定)")
+
+    def add_library_command(name, func, help_text, folder_required=True):
+        sub = subparsers.add_parser(name, help=help_text, description=help_text)
+        if folder_required:
+            sub.add_argument('folder', help="書籍フォルダ")
+        else:
+            sub.add_argument('folder', nargs='?', help="このフォルダ内の書籍だけを対象にする")
+        sub.add_argument('-r', '--recursive', action='store_true', help="サブフォルダ内の書籍も対象にする")
+        sub.add_argument('-j', '--workers', type=int, default=None, help="プロセス数 (省略時はCPUコア数)")
+        sub.add_argument('--db', default=LIBRARY_DB_FILE, help="ライブラリインデックスのファイル")
+        sub.add_argument('--progress', default=PROGRESS_FILE, help="読書進捗のファイル")
+        sub.add_argument('--thumbnail-dir', default=THUMBNAIL_DIR, help="サムネイルのキャッシュフォルダ")
+        sub.set_defaults(func=func)
+        return sub
+
+    add_library_command('index', command_index, "スキャンしてインデックスを更新し、ページ数を計算する")
+    add_library_command('thumbnails', command_thumbnails, "表紙サムネイルを作成する")
+    add_library_command('warm', command_warm, "インデックス/ページ数/サムネイルをまとめて準備する")
+    verify_parser = add_library_command('verify', command_verify, "書籍の整合性 (CRCと画像ヘッダー) をチェックする")
+    verify_parser.add_argument('--io-limit', type=int, default=4, help="同時に読み込む書籍の数")
+    verify_parser.add_argument('--all', action='store_true', help="チェック済みで変更のない書籍もチェックし直す")
+    list_parser = add_library_command('list', command_list, "書籍の一覧と統計を表示する")
+    list_parser.add_argument('--format', choices=('table', 'json', 'csv'), default='table', help="出力形式")
+    list_parser.add_argument('--scan', action='store_true', help="表示前にスキャンしてインデックスを更新する")
+    export_parser = add_library_command('export-progress', command_export_progress, "読書進捗を書き出す", folder_required=False)
+    export_parser.add_argument('--format', choices=('json', 'csv'), default='json', help="出力形式")
+    export_parser.add_argument('-o', '--output', help="出力ファイル (省略時は標準出力)")
+    return parser
+
+
+def run_gui(startup_report=False):
+    """GUIを起動します。"""
+    startup_profile = StartupProfile(verbose=startup_report)
+    startup_profile.mark("モジュールの読み込み")
+
+    root = create_main_window()
     root.geometry("1200x800")
+    startup_profile.mark("ウィンドウの作成")
     
     # キーボードイベントを受け取るためにフォーカスを設定
     root.focus_set() 
     
-    app = BookManagerApp(root)
-    root.mainloop()
\ No newline at end of file
+    BookManagerApp(root, startup_profile)
+    root.mainloop()
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    if args.command in (None, 'gui'):
+        run_gui(args.startup_report)
+        return 0
+    if getattr(args, 'folder', None):
+        args.folder = os.path.abspath(args.folder)
+        if not os.path.isdir(args.folder):
+            print(f"エラー: フォルダが存在しません: {args.folder}", file=sys.stderr)
+            return 2
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())